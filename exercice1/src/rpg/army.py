@@ -0,0 +1,138 @@
+from array import array
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from .spatial import GridIndex
+
+try:
+    import numpy as np
+except ImportError:  # optional: the batched operations fall back to plain loops
+    np = None
+
+
+def _view(column: array):
+    # writable NumPy view of the column; must not outlive the call, since the
+    # array cannot grow while a buffer export is alive
+    return np.frombuffer(column, dtype=column.typecode)
+
+
+def as_column(values: List[int]):
+    # rows or per-row values in the form the ArmyStore operations take
+    return values if np is None else np.asarray(values, dtype=np.int64)
+
+
+def unique_rows(rows: List[int]) -> tuple:
+    # (distinct rows, how many times each appears or None when none repeats),
+    # in the form the ArmyStore operations take
+    if np is None:
+        counts: Dict[int, int] = {}
+        for r in rows:
+            counts[r] = counts.get(r, 0) + 1
+        return list(counts), (list(counts.values()) if len(counts) < len(rows) else None)
+    unique, counts = np.unique(np.asarray(rows, dtype=np.intp), return_counts=True)
+    return unique, (counts if len(unique) < len(rows) else None)
+
+
+class ArmyStore:
+    # Struct-of-arrays storage for combat units: one row per unit, units are
+    # views onto their row. `rows` arguments come from unique_rows() and must
+    # not repeat; `counts` (same length, or None for all ones) says how many times
+    # the operation applies to each row. Every change stamps the rows it
+    # touched with a new `clock` value, which is how displays notice changes.
+
+    def __init__(self) -> None:
+        self.hp = array("q")
+        self.xp = array("q")
+        self.x = array("q")
+        self.y = array("q")
+        self.kind = array("B")
+        self.stamp = array("q")
+        self.clock = 0
+        self.spatial: Optional["GridIndex"] = None
+
+    def __len__(self) -> int:
+        return len(self.hp)
+
+    def add(self, kind: int, hp: int, xp: int) -> int:
+        self.hp.append(hp)
+        self.xp.append(xp)
+        self.x.append(0)
+        self.y.append(0)
+        self.kind.append(kind)
+        self.stamp.append(self.clock)
+        row = len(self.hp) - 1
+        if self.spatial is not None:
+            self.spatial.added(row)
+        return row
+
+    def touch(self, row: int) -> None:
+        self.clock += 1
+        self.stamp[row] = self.clock
+
+    def _touch(self, rows) -> None:
+        self.clock += 1
+        if np is not None:
+            _view(self.stamp)[rows] = self.clock
+            return
+        for r in rows:
+            self.stamp[r] = self.clock
+
+    def changed_since(self, rows, clock: int) -> bool:
+        if self.clock == clock:
+            return False
+        if np is not None:
+            return bool((_view(self.stamp)[rows] > clock).any())
+        return any(self.stamp[r] > clock for r in rows)
+
+    def place(self, row: int, x: int, y: int) -> None:
+        self.x[row] = x
+        self.y[row] = y
+        self.touch(row)
+        if self.spatial is not None:
+            self.spatial.moved((row,), x, y)
+
+    def move(self, rows, x: int, y: int) -> None:
+        if np is not None:
+            _view(self.x)[rows] = x
+            _view(self.y)[rows] = y
+        else:
+            for r in rows:
+                self.x[r] = x
+                self.y[r] = y
+        self._touch(rows)
+        if self.spatial is not None:
+            self.spatial.moved(rows, x, y)
+
+    def rest(self, rows, amount: int, counts: Optional[Sequence[int]] = None) -> None:
+        self._touch(rows)
+        if np is not None:
+            _view(self.hp)[rows] += amount if counts is None else amount * counts
+            return
+        for k, r in enumerate(rows):
+            self.hp[r] += amount if counts is None else amount * counts[k]
+
+    def damage(self, rows, amount: int, counts: Optional[Sequence[int]] = None) -> None:
+        self._touch(rows)
+        if np is not None:
+            hp = _view(self.hp)
+            hp[rows] = np.maximum(hp[rows] - (amount if counts is None else amount * counts), 0)
+            return
+        for k, r in enumerate(rows):
+            self.hp[r] = max(0, self.hp[r] - (amount if counts is None else amount * counts[k]))
+
+    def attack(self, rows, xp_gain: Sequence[int], counts: Optional[Sequence[int]] = None) -> List[int]:
+        # adds each row's xp gain (xp_gain is indexed by kind) and returns how
+        # many attacks each kind made
+        self._touch(rows)
+        if np is not None:
+            kinds = _view(self.kind)[rows]
+            gain = np.asarray(xp_gain, dtype=np.int64)[kinds]
+            _view(self.xp)[rows] += gain if counts is None else gain * counts
+            return np.bincount(kinds, weights=counts, minlength=len(xp_gain)).astype(np.int64).tolist()
+        attacks = [0] * len(xp_gain)
+        for k, r in enumerate(rows):
+            n = 1 if counts is None else counts[k]
+            kind = self.kind[r]
+            self.xp[r] += xp_gain[kind] * n
+            attacks[kind] += n
+        return attacks
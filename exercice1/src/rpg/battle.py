@@ -0,0 +1,151 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Iterable, List, Mapping, Optional, Sequence
+
+from .commander import Commander
+from .units import UNIT_TYPES, CombatUnitBase
+
+# a side's composition, e.g. {"Warrior": 3, "Wizard": 1}
+Composition = Mapping[str, int]
+
+_CREATE = {cls.__name__: "create_" + cls.__name__.lower() for cls in UNIT_TYPES}
+
+
+@dataclass(frozen=True)
+class BattleResult:
+    seed: int
+    winner: Optional[str]  # "a", "b" or None for a draw
+    ticks: int
+    survivors_a: int
+    survivors_b: int
+
+
+@dataclass
+class BattleStats:
+    battles: int = 0
+    wins_a: int = 0
+    wins_b: int = 0
+    draws: int = 0
+    ticks: int = 0
+    survivors_a: int = 0
+    survivors_b: int = 0
+
+    def add(self, result: BattleResult) -> None:
+        self.battles += 1
+        if result.winner == "a":
+            self.wins_a += 1
+        elif result.winner == "b":
+            self.wins_b += 1
+        else:
+            self.draws += 1
+        self.ticks += result.ticks
+        self.survivors_a += result.survivors_a
+        self.survivors_b += result.survivors_b
+
+    def merge(self, other: "BattleStats") -> None:
+        for name in self.__dataclass_fields__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    @property
+    def win_rate_a(self) -> float:
+        return self.wins_a / self.battles if self.battles else 0.0
+
+    @property
+    def mean_ticks(self) -> float:
+        return self.ticks / self.battles if self.battles else 0.0
+
+
+class Battle:
+    # Two sides fight in ticks: every unit alive when a tick starts attacks a
+    # living enemy drawn from the seeded generator, and the tick's hits all
+    # land together. The same sides and seed always give the same battle.
+
+    def __init__(
+        self,
+        side_a: Sequence[CombatUnitBase],
+        side_b: Sequence[CombatUnitBase],
+        seed: int = 0,
+        max_ticks: int = 1000,
+    ) -> None:
+        self.side_a = list(side_a)
+        self.side_b = list(side_b)
+        self.seed = seed
+        self.max_ticks = max_ticks
+        self.ticks = 0
+        self._rng = random.Random(seed)
+
+    @staticmethod
+    def _alive(side: List[CombatUnitBase]) -> List[CombatUnitBase]:
+        return [unit for unit in side if unit.hp > 0]
+
+    def over(self) -> bool:
+        return self.ticks >= self.max_ticks or not self._alive(self.side_a) or not self._alive(self.side_b)
+
+    def step(self) -> None:
+        alive_a, alive_b = self._alive(self.side_a), self._alive(self.side_b)
+        choice = self._rng.choice
+        hits = [(unit, choice(alive_b)) for unit in alive_a] + [(unit, choice(alive_a)) for unit in alive_b]
+        for unit, target in hits:
+            unit.attack(target)
+        self.ticks += 1
+
+    def run(self) -> BattleResult:
+        while not self.over():
+            self.step()
+        left_a, left_b = len(self._alive(self.side_a)), len(self._alive(self.side_b))
+        winner = "a" if left_a and not left_b else "b" if left_b and not left_a else None
+        return BattleResult(self.seed, winner, self.ticks, left_a, left_b)
+
+
+def _check(composition: Composition) -> None:
+    for name in composition:
+        if name not in _CREATE:
+            raise ValueError(f"unknown unit type {name!r}")
+
+
+def _army(cmd: Commander, composition: Composition) -> List[CombatUnitBase]:
+    _check(composition)
+    return [getattr(cmd, _CREATE[name])() for name, count in composition.items() for _ in range(count)]
+
+
+def simulate(side_a: Composition, side_b: Composition, seed: int = 0, max_ticks: int = 1000) -> BattleResult:
+    cmd = Commander()
+    return Battle(_army(cmd, side_a), _army(cmd, side_b), seed, max_ticks).run()
+
+
+def _run_seeds(side_a: Composition, side_b: Composition, max_ticks: int, seeds: Iterable[int]) -> BattleStats:
+    stats = BattleStats()
+    for seed in seeds:
+        stats.add(simulate(side_a, side_b, seed, max_ticks))
+    return stats
+
+
+def run_battles(
+    side_a: Composition,
+    side_b: Composition,
+    battles: int,
+    seed: int = 0,
+    max_ticks: int = 1000,
+    workers: Optional[int] = None,
+) -> BattleStats:
+    # battle i uses seed + i whatever the process it runs in, and the merged
+    # statistics are sums, so the result does not depend on `workers`
+    _check(side_a)
+    _check(side_b)
+    workers = workers or os.cpu_count() or 1
+    seeds = range(seed, seed + battles)
+    size = max(1, -(-battles // (workers * 4)))
+    chunks = [seeds[i : i + size] for i in range(0, battles, size)]
+    run = partial(_run_seeds, dict(side_a), dict(side_b), max_ticks)
+    total = BattleStats()
+    if workers == 1 or len(chunks) <= 1:
+        for part in map(run, chunks):
+            total.merge(part)
+        return total
+    with ProcessPoolExecutor(workers) as pool:
+        for part in pool.map(run, chunks):
+            total.merge(part)
+    return total
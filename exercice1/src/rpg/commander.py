@@ -1,27 +1,37 @@
 from typing import List
 
+from .army import ArmyStore
+from .commands import Command, CommandQueue, TickStats
 from .group import CombatGroup
 from .interfaces import ICombatUnit
-from .units import Spy, Warrior, Wizard
+from .spatial import GridIndex
+from .units import CombatUnitBase, Spy, Warrior, Wizard
 
 
 class Commander:
-    def __init__(self) -> None:
+    def __init__(self, cell_size: int = 16) -> None:
         self._units: List[ICombatUnit] = []
+        self._store = ArmyStore()
+        self._spatial = GridIndex(self._store, cell_size)
+        self._by_row: List[CombatUnitBase] = []
+        self._orders = CommandQueue()
 
     def create_warrior(self) -> Warrior:
-        unit = Warrior()
+        unit = Warrior(store=self._store)
         self._units.append(unit)
+        self._by_row.append(unit)
         return unit
 
     def create_spy(self) -> Spy:
-        unit = Spy()
+        unit = Spy(store=self._store)
         self._units.append(unit)
+        self._by_row.append(unit)
         return unit
 
     def create_wizard(self) -> Wizard:
-        unit = Wizard()
+        unit = Wizard(store=self._store)
         self._units.append(unit)
+        self._by_row.append(unit)
         return unit
 
     def create_group(self) -> CombatGroup:
@@ -30,4 +40,22 @@ class Commander:
         return grp
 
     def units(self) -> List[ICombatUnit]:
-        return list(self._units)
\ No newline at end of file
+        return list(self._units)
+
+    def units_within(self, x: int, y: int, radius: int) -> List[CombatUnitBase]:
+        return [self._by_row[r] for r in self._spatial.within(x, y, radius)]
+
+    def units_in_rect(self, x0: int, y0: int, x1: int, y1: int) -> List[CombatUnitBase]:
+        return [self._by_row[r] for r in self._spatial.in_rect(x0, y0, x1, y1)]
+
+    def nearest_units(self, x: int, y: int, k: int = 1) -> List[CombatUnitBase]:
+        return [self._by_row[r] for r in self._spatial.nearest(x, y, k)]
+
+    def order(self, command: Command) -> None:
+        # queued until the next tick(), which applies all moves, then rests,
+        # then damage: a rest ordered after a hit in the same tick is applied
+        # before it
+        self._orders.submit(command)
+
+    def tick(self) -> TickStats:
+        return self._orders.flush()
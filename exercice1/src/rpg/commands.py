@@ -0,0 +1,164 @@
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+from .army import ArmyStore, as_column
+from .group import take_hits
+from .interfaces import ICombatUnit
+from .units import UNIT_TYPES
+
+
+class Move(NamedTuple):
+    target: ICombatUnit
+    x: int
+    y: int
+
+
+class Rest(NamedTuple):
+    target: ICombatUnit
+    amount: int
+
+
+class Damage(NamedTuple):
+    target: ICombatUnit
+    amount: int
+
+
+Command = Union[Move, Rest, Damage]
+
+
+@dataclass(frozen=True)
+class TickStats:
+    received: int
+    applied: int
+
+    @property
+    def coalesced(self) -> int:
+        return self.received - self.applied
+
+
+# per store: (store, rows, one value per row, queue key per row)
+_Batch = Dict[int, Tuple[ArmyStore, List[int], List[int], List[int]]]
+# per (store, x, y): (store, rows, queue key per row)
+_MoveBatch = Dict[Tuple[int, int, int], Tuple[ArmyStore, List[int], List[int]]]
+
+
+class CommandQueue:
+    # Orders wait here until flush(), coalesced per target: the last move
+    # wins, rests add up, damage is counted per amount (a group splits every
+    # hit, so only equal hits can be merged; a unit's hits simply add up).
+    # flush() applies the moves, then the rests, then the damage, whatever the
+    # submission order (Damage(200) then Rest(50) on a 100 hp unit leaves it at
+    # 0, not 50); orders to built-in units become one ArmyStore operation per
+    # store. Orders leave the queue only as they are applied: if one raises,
+    # flush() re-raises with that order dropped and everything not applied yet
+    # still queued for the next flush().
+
+    def __init__(self) -> None:
+        self._moves: Dict[int, Move] = {}
+        self._rests: Dict[int, Tuple[ICombatUnit, int]] = {}
+        self._damage: Dict[int, Tuple[ICombatUnit, Dict[int, int]]] = {}
+        self._received = 0
+
+    def __len__(self) -> int:
+        return self._received
+
+    def submit(self, command: Command) -> None:
+        key = id(command.target)
+        if isinstance(command, Move):
+            # moved to the end: moves run in the order of their last submission
+            self._moves.pop(key, None)
+            self._moves[key] = command
+        elif isinstance(command, (Rest, Damage)):
+            if command.amount < 0:
+                raise ValueError()
+            if isinstance(command, Rest):
+                total = self._rests.get(key, (None, 0))[1]
+                self._rests[key] = (command.target, total + command.amount)
+            else:
+                hits = self._damage.setdefault(key, (command.target, {}))[1]
+                hits[command.amount] = hits.get(command.amount, 0) + 1
+        else:
+            raise TypeError(f"not a command: {command!r}")
+        self._received += 1
+
+    def flush(self) -> TickStats:
+        received = self._received
+        try:
+            applied = _apply_moves(self._moves) + _apply_rests(self._rests) + _apply_damage(self._damage)
+        except BaseException:
+            self._received = len(self._moves) + len(self._rests) + sum(len(h) for _, h in self._damage.values())
+            raise
+        self._received = 0
+        return TickStats(received, applied)
+
+
+def _batch(batch: _Batch, unit, key: int, value: int) -> None:
+    entry = batch.get(id(unit._store))
+    if entry is None:
+        entry = batch[id(unit._store)] = (unit._store, [], [], [])
+    entry[1].append(unit._row)
+    entry[2].append(value)
+    entry[3].append(key)
+
+
+def _apply_moves(moves: Dict[int, Move]) -> int:
+    # a group's move overrides the earlier moves of its members, so the unit
+    # moves batched so far are applied before it
+    batch: _MoveBatch = {}
+    count = 0
+    for key, (target, x, y) in list(moves.items()):
+        count += 1
+        if type(target) in UNIT_TYPES:
+            entry = batch.setdefault((id(target._store), x, y), (target._store, [], []))
+            entry[1].append(target._row)
+            entry[2].append(key)
+        else:
+            _move_batch(batch, moves)
+            del moves[key]
+            target.move(x, y)
+    _move_batch(batch, moves)
+    return count
+
+
+def _move_batch(batch: _MoveBatch, moves: Dict[int, Move]) -> None:
+    for (_, x, y), (store, rows, keys) in batch.items():
+        store.move(as_column(rows), x, y)
+        for key in keys:
+            del moves[key]
+    batch.clear()
+
+
+def _apply_rests(rests: Dict[int, Tuple[ICombatUnit, int]]) -> int:
+    batch: _Batch = {}
+    count = 0
+    for key, (target, amount) in list(rests.items()):
+        count += 1
+        if type(target) in UNIT_TYPES:
+            _batch(batch, target, key, amount)
+        else:
+            del rests[key]
+            target.rest(amount)
+    for store, rows, amounts, keys in batch.values():
+        store.rest(as_column(rows), 1, as_column(amounts))
+        for key in keys:
+            del rests[key]
+    return count
+
+
+def _apply_damage(damage: Dict[int, Tuple[ICombatUnit, Dict[int, int]]]) -> int:
+    batch: _Batch = {}
+    count = 0
+    for key, (target, hits) in list(damage.items()):
+        if type(target) in UNIT_TYPES:
+            _batch(batch, target, key, sum(i * n for i, n in hits.items()))
+            count += 1
+            continue
+        for i in list(hits):
+            take_hits(target, i, hits.pop(i))
+            count += 1
+        del damage[key]
+    for store, rows, totals, keys in batch.values():
+        store.damage(as_column(rows), 1, as_column(totals))
+        for key in keys:
+            del damage[key]
+    return count
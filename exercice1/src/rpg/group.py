@@ -1,36 +1,138 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
+from .army import ArmyStore, unique_rows
 from .interfaces import ICombatUnit
+from .units import UNIT_TYPES
+
+_XP_GAIN = [cls.xp_gain for cls in UNIT_TYPES]
+
+
+class _Plan:
+    # A group's subtree flattened to its leaves, so that an order is one store
+    # operation per store whatever the nesting. Built-in units become row sets
+    # (counts = number of paths to the unit); anything else (custom units or
+    # group classes) is kept as (unit, divisor) and called one by one.
+    # take_damage splits i // len(children) at every level; nested floor
+    # divisions equal one division by the product, so each leaf only needs
+    # that product (its divisor).
+
+    def __init__(self, group: "CombatGroup") -> None:
+        paths: Dict[Tuple[int, int], Tuple[ArmyStore, List[int]]] = {}
+        self.others: List[Tuple[ICombatUnit, int]] = []
+        stack = [(group, 1)]
+        while stack:
+            grp, divisor = stack.pop()
+            divisor *= len(grp._children)
+            for unit in grp._children:
+                if type(unit) is CombatGroup:
+                    stack.append((unit, divisor))
+                elif type(unit) in UNIT_TYPES:
+                    entry = paths.get((id(unit._store), divisor))
+                    if entry is None:
+                        entry = paths[(id(unit._store), divisor)] = (unit._store, [])
+                    entry[1].append(unit._row)
+                else:
+                    self.others.append((unit, divisor))
+        self.damage = [(divisor, store, *unique_rows(rows)) for (_, divisor), (store, rows) in paths.items()]
+        per_store: Dict[int, Tuple[ArmyStore, List[int]]] = {}
+        for (key, _), (store, rows) in paths.items():
+            per_store.setdefault(key, (store, []))[1].extend(rows)
+        self.stores = [(store, *unique_rows(rows)) for store, rows in per_store.values()]
+        self.has_leaves = bool(self.stores or self.others)
 
 
 class CombatGroup(ICombatUnit):
     def __init__(self) -> None:
         self._children: List[ICombatUnit] = []
+        self._parents: List["CombatGroup"] = []
+        self._plan: Optional[_Plan] = None
+        self._shown: Optional[str] = None
+        self._shown_at: List[int] = []
 
     def add(self, unit: ICombatUnit) -> None:
+        if isinstance(unit, CombatGroup):
+            if self._within(unit):
+                raise ValueError("a group cannot contain itself")
+            unit._parents.append(self)
         self._children.append(unit)
+        self._invalidate()
 
     def remove(self, unit: ICombatUnit) -> None:
         self._children.remove(unit)
+        if isinstance(unit, CombatGroup):
+            unit._parents.remove(self)
+        self._invalidate()
+
+    def _within(self, group: "CombatGroup") -> bool:
+        return self is group or any(parent._within(group) for parent in self._parents)
+
+    def _invalidate(self) -> None:
+        # membership changed here: every group above sees a different subtree
+        self._plan = None
+        self._shown = None
+        for parent in self._parents:
+            parent._invalidate()
+
+    def _planned(self) -> _Plan:
+        if self._plan is None:
+            self._plan = _Plan(self)
+        return self._plan
 
     def move(self, x: int, y: int) -> None:
-        for unit in self._children:
+        plan = self._planned()
+        for store, rows, _ in plan.stores:
+            store.move(rows, x, y)
+        for unit, _ in plan.others:
             unit.move(x, y)
 
     def rest(self, d: int) -> None:
-        for unit in self._children:
+        plan = self._planned()
+        if d < 0 and plan.has_leaves:
+            raise ValueError()
+        for store, rows, counts in plan.stores:
+            store.rest(rows, d, counts)
+        for unit, _ in plan.others:
             unit.rest(d)
 
     def take_damage(self, i: int) -> None:
-        if not self._children:
-            return
-        share = i // len(self._children)
-        for unit in self._children:
-            unit.take_damage(share)
+        self._take_hits(i, 1)
+
+    def _take_hits(self, i: int, times: int) -> None:
+        # same as `times` calls to take_damage(i)
+        plan = self._planned()
+        if i < 0 and plan.has_leaves:
+            raise ValueError()
+        for divisor, store, rows, counts in plan.damage:
+            store.damage(rows, i // divisor * times, counts)
+        for unit, divisor in plan.others:
+            take_hits(unit, i // divisor, times)
 
     def display(self) -> str:
-        return "[" + ", ".join(unit.display() for unit in self._children) + "]"
+        # children whose rows did not change return their cached text
+        plan = self._planned()
+        if self._shown is not None and not plan.others:
+            if not any(
+                store.changed_since(rows, at) for (store, rows, _), at in zip(plan.stores, self._shown_at)
+            ):
+                return self._shown
+        self._shown = "[" + ", ".join(unit.display() for unit in self._children) + "]"
+        self._shown_at = [store.clock for store, _, _ in plan.stores]
+        return self._shown
 
     def attack(self, target: ICombatUnit) -> None:
-        for unit in self._children:
-            unit.attack(target)
\ No newline at end of file
+        plan = self._planned()
+        for store, rows, counts in plan.stores:
+            for kind, n in enumerate(store.attack(rows, _XP_GAIN, counts)):
+                if n:
+                    take_hits(target, UNIT_TYPES[kind].damage, n)
+        for unit, _ in plan.others:
+            unit.attack(target)
+
+
+def take_hits(target: ICombatUnit, i: int, times: int) -> None:
+    # same as `times` calls to target.take_damage(i), batched for built-in types
+    if type(target) in UNIT_TYPES or type(target) is CombatGroup:
+        target._take_hits(i, times)
+    else:
+        for _ in range(times):
+            target.take_damage(i)
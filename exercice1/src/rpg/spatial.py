@@ -0,0 +1,148 @@
+import heapq
+from array import array
+from typing import Dict, List, Set, Tuple
+
+from . import army
+from .army import ArmyStore
+
+_SPAN = 2**32
+
+
+def _key(cx: int, cy: int) -> int:
+    return cx * _SPAN + cy
+
+
+class GridIndex:
+    # Uniform grid over the positions of an ArmyStore's rows: cell -> set of
+    # rows. The store reports every add and move, so the grid is always current.
+    # Queries return row numbers; distances are exact, cells only prune.
+
+    def __init__(self, store: ArmyStore, cell_size: int = 16) -> None:
+        if cell_size < 1:
+            raise ValueError("cell_size must be >= 1")
+        self.store = store
+        self.cell_size = cell_size
+        self._cells: Dict[int, Set[int]] = {}
+        self._cell_of = array("q")
+        for row in range(len(store)):
+            self.added(row)
+        store.spatial = self
+
+    def __len__(self) -> int:
+        return len(self._cell_of)
+
+    def _cell_key(self, x: int, y: int) -> int:
+        return _key(x // self.cell_size, y // self.cell_size)
+
+    def added(self, row: int) -> None:
+        key = self._cell_key(self.store.x[row], self.store.y[row])
+        self._cell_of.append(key)
+        self._cells.setdefault(key, set()).add(row)
+
+    def moved(self, rows, x: int, y: int) -> None:
+        key = self._cell_key(x, y)
+        np = army.np
+        if np is not None and len(rows) > 32:
+            # a group order: move whole slices from each source cell at once
+            rows = np.asarray(rows)
+            cell_of = army._view(self._cell_of)
+            old = cell_of[rows]
+            leaving = old != key
+            if leaving.any():
+                rows, old = rows[leaving], old[leaving]
+                order = np.argsort(old, kind="stable")
+                rows, old = rows[order], old[order]
+                starts = np.flatnonzero(np.r_[True, old[1:] != old[:-1]])
+                if len(starts) == 1 and key not in self._cells and len(self._cells[int(old[0])]) == len(rows):
+                    # the whole cell moves together: hand over its set
+                    self._cells[key] = self._cells.pop(int(old[0]))
+                    cell_of[rows] = key
+                    return
+                bounds = np.r_[starts, len(old)].tolist()
+                for k, old_key in enumerate(old[starts].tolist()):
+                    self._leave(old_key, rows[bounds[k] : bounds[k + 1]].tolist())
+                self._cells.setdefault(key, set()).update(rows.tolist())
+                cell_of[rows] = key
+            return
+        for row in map(int, rows):
+            old_key = self._cell_of[row]
+            if old_key != key:
+                self._leave(old_key, (row,))
+                self._cells.setdefault(key, set()).add(row)
+                self._cell_of[row] = key
+
+    def _leave(self, key: int, rows) -> None:
+        bucket = self._cells[key]
+        bucket.difference_update(rows)
+        if not bucket:
+            del self._cells[key]
+
+    def _candidates(self, x0: int, y0: int, x1: int, y1: int):
+        size = self.cell_size
+        for cx in range(x0 // size, x1 // size + 1):
+            for cy in range(y0 // size, y1 // size + 1):
+                bucket = self._cells.get(_key(cx, cy))
+                if bucket:
+                    yield from bucket
+
+    def in_rect(self, x0: int, y0: int, x1: int, y1: int) -> List[int]:
+        xs, ys = self.store.x, self.store.y
+        return sorted(
+            r for r in self._candidates(x0, y0, x1, y1) if x0 <= xs[r] <= x1 and y0 <= ys[r] <= y1
+        )
+
+    def within(self, x: int, y: int, radius: int) -> List[int]:
+        xs, ys = self.store.x, self.store.y
+        limit = radius * radius
+        return sorted(
+            r
+            for r in self._candidates(x - radius, y - radius, x + radius, y + radius)
+            if (xs[r] - x) ** 2 + (ys[r] - y) ** 2 <= limit
+        )
+
+    def nearest(self, x: int, y: int, k: int = 1) -> List[int]:
+        # rings of cells around (x, y); stops once the next ring cannot hold
+        # anything closer than the k-th best candidate
+        if k < 1 or not self._cells:
+            return []
+        size = self.cell_size
+        xs, ys = self.store.x, self.store.y
+        cx, cy = x // size, y // size
+        best: List[Tuple[int, int]] = []  # max-heap of (-distance², -row)
+        seen = 0
+        ring = 0
+        while True:
+            if 8 * ring > len(self._cells):
+                # far from everything: the rings would mostly visit empty cells
+                return self._nearest_scan(x, y, k)
+            for cell in _ring(cx, cy, ring):
+                bucket = self._cells.get(cell)
+                if not bucket:
+                    continue
+                seen += len(bucket)
+                for r in bucket:
+                    item = (-((xs[r] - x) ** 2 + (ys[r] - y) ** 2), -r)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+            # every point outside the rings searched so far is at least this far
+            margin = min(x - cx * size, y - cy * size, (cx + 1) * size - 1 - x, (cy + 1) * size - 1 - y)
+            reach = ring * size + margin
+            if seen == len(self._cell_of) or (len(best) == k and -best[0][0] <= reach * reach):
+                break
+            ring += 1
+        return [-r for _, r in sorted(best, reverse=True)]
+
+    def _nearest_scan(self, x: int, y: int, k: int) -> List[int]:
+        xs, ys = self.store.x, self.store.y
+        rows = (r for bucket in self._cells.values() for r in bucket)
+        return [r for _, r in heapq.nsmallest(k, (((xs[r] - x) ** 2 + (ys[r] - y) ** 2, r) for r in rows))]
+
+
+def _ring(cx: int, cy: int, ring: int) -> List[int]:
+    if ring == 0:
+        return [_key(cx, cy)]
+    cells = [_key(cx + dx, cy + dy) for dx in range(-ring, ring + 1) for dy in (-ring, ring)]
+    cells += [_key(cx + dx, cy + dy) for dx in (-ring, ring) for dy in range(-ring + 1, ring)]
+    return cells
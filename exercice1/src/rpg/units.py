@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+from typing import Optional, Tuple
 
+from .army import ArmyStore
 from .interfaces import ICombatUnit
 
 
@@ -11,32 +13,58 @@ class Position:
 
 
 class CombatUnitBase(ICombatUnit, ABC):
-    def __init__(self, hp: int = 100, xp: int = 0) -> None:
-        self._hp = hp
-        self._xp = xp
-        self._position = Position()
+    # a view onto one row of an ArmyStore (its own store when none is given)
+    kind = 0
+    damage = 0
+    xp_gain = 0
+
+    def __init__(self, hp: int = 100, xp: int = 0, store: Optional[ArmyStore] = None) -> None:
+        self._store = ArmyStore() if store is None else store
+        self._row = self._store.add(self.kind, hp, xp)
+        self._shown: Optional[Tuple[int, str]] = None
 
     @property
     def hp(self) -> int:
-        return self._hp
+        return self._store.hp[self._row]
 
     @property
     def xp(self) -> int:
-        return self._xp
+        return self._store.xp[self._row]
 
     @property
     def position(self) -> Position:
-        return self._position
+        return Position(self._store.x[self._row], self._store.y[self._row])
 
     def rest(self, d: int) -> None:
         if d < 0:
             raise ValueError()
-        self._hp += d
+        self._store.hp[self._row] += d
+        self._store.touch(self._row)
 
     def take_damage(self, i: int) -> None:
         if i < 0:
             raise ValueError()
-        self._hp = max(0, self._hp - i)
+        self._store.hp[self._row] = max(0, self._store.hp[self._row] - i)
+        self._store.touch(self._row)
+
+    def _take_hits(self, i: int, times: int) -> None:
+        # same as `times` calls to take_damage(i)
+        self.take_damage(i * times)
+
+    def _place(self, x: int, y: int) -> None:
+        self._store.place(self._row, x, y)
+
+    def _gain_xp(self, amount: int) -> None:
+        self._store.xp[self._row] += amount
+        self._store.touch(self._row)
+
+    def _describe(self) -> str:
+        # re-rendered only when the row was stamped since the last call
+        stamp = self._store.stamp[self._row]
+        if self._shown is None or self._shown[0] != stamp:
+            pos = self.position
+            self._shown = (stamp, f"{type(self).__name__}(hp={self.hp}, xp={self.xp}, pos=({pos.x},{pos.y}))")
+        return self._shown[1]
 
     @abstractmethod
     def move(self, x: int, y: int) -> None:
@@ -52,36 +80,52 @@ class CombatUnitBase(ICombatUnit, ABC):
 
 
 class Warrior(CombatUnitBase):
+    kind = 0
+    damage = 10
+    xp_gain = 5
+
     def move(self, x: int, y: int) -> None:
-        self._position = Position(x, y)
+        self._place(x, y)
 
     def display(self) -> str:
-        return f"Warrior(hp={self._hp}, xp={self._xp}, pos=({self._position.x},{self._position.y}))"
+        return self._describe()
 
     def attack(self, target: ICombatUnit) -> None:
-        target.take_damage(10)
-        self._xp += 5
+        target.take_damage(self.damage)
+        self._gain_xp(self.xp_gain)
 
 
 class Spy(CombatUnitBase):
+    kind = 1
+    damage = 6
+    xp_gain = 7
+
     def move(self, x: int, y: int) -> None:
-        self._position = Position(x, y)
+        self._place(x, y)
 
     def display(self) -> str:
-        return f"Spy(hp={self._hp}, xp={self._xp}, pos=({self._position.x},{self._position.y}))"
+        return self._describe()
 
     def attack(self, target: ICombatUnit) -> None:
-        target.take_damage(6)
-        self._xp += 7
+        target.take_damage(self.damage)
+        self._gain_xp(self.xp_gain)
 
 
 class Wizard(CombatUnitBase):
+    kind = 2
+    damage = 8
+    xp_gain = 6
+
     def move(self, x: int, y: int) -> None:
-        self._position = Position(x, y)
+        self._place(x, y)
 
     def display(self) -> str:
-        return f"Wizard(hp={self._hp}, xp={self._xp}, pos=({self._position.x},{self._position.y}))"
+        return self._describe()
 
     def attack(self, target: ICombatUnit) -> None:
-        target.take_damage(8)
-        self._xp += 6
\ No newline at end of file
+        target.take_damage(self.damage)
+        self._gain_xp(self.xp_gain)
+
+
+# indexed by `kind`: the unit types CombatGroup runs as batched store operations
+UNIT_TYPES = (Warrior, Spy, Wizard)
@@ -0,0 +1,13 @@
+import pytest
+
+from src.rpg import army
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "fallback"])
+def vectorized(request, monkeypatch):
+    # runs a test on the NumPy path and on the plain-loop fallback
+    if not request.param:
+        monkeypatch.setattr(army, "np", None)
+    elif army.np is None:
+        pytest.skip("numpy is not installed")
+    return request.param
@@ -0,0 +1,39 @@
+import pytest
+
+from src.rpg.commander import Commander
+from src.rpg.units import Position, Warrior
+
+
+def test_group_orders_match_one_call_per_child(vectorized):
+    cmd = Commander()
+    w, s, z = cmd.create_warrior(), cmd.create_spy(), cmd.create_wizard()
+    loner = Warrior()
+    squad = cmd.create_group()
+    for unit in (w, s, w):
+        squad.add(unit)
+    legion = cmd.create_group()
+    for unit in (squad, z, loner):
+        legion.add(unit)
+    enemy = cmd.create_group()
+    e1, e2 = cmd.create_warrior(), cmd.create_spy()
+    enemy.add(e1)
+    enemy.add(e2)
+
+    legion.move(4, -2)
+    squad.take_damage(30)
+    legion.rest(5)
+    squad.attack(enemy)
+    z.attack(enemy)
+
+    assert [w.position, loner.position] == [Position(4, -2), Position(4, -2)]
+    assert [w.hp, s.hp, z.hp, loner.hp] == [90, 95, 105, 105]
+    assert [w.xp, s.xp, z.xp] == [10, 7, 6]
+    assert [e1.hp, e2.hp] == [83, 83]
+    assert w.display() == "Warrior(hp=90, xp=10, pos=(4,-2))"
+
+    squad.remove(w)
+    squad.remove(w)
+    squad.take_damage(1000)
+    assert [w.hp, s.hp] == [90, 0]
+    with pytest.raises(ValueError):
+        legion.rest(-1)
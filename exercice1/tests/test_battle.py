@@ -0,0 +1,26 @@
+import pytest
+
+from src.rpg.battle import Battle, run_battles, simulate
+from src.rpg.commander import Commander
+
+
+def test_battle_is_deterministic_per_seed():
+    first = simulate({"Warrior": 3, "Spy": 2}, {"Wizard": 5}, seed=7)
+    assert simulate({"Warrior": 3, "Spy": 2}, {"Wizard": 5}, seed=7) == first
+    assert first.winner in ("a", "b", None) and first.ticks > 0
+
+    cmd = Commander()
+    lone = cmd.create_warrior()
+    result = Battle([lone], [], seed=1).run()
+    assert (result.winner, result.ticks, result.survivors_a) == ("a", 0, 1)
+
+    with pytest.raises(ValueError):
+        simulate({"Dragon": 1}, {"Spy": 1})
+
+
+def test_batch_runner_merges_the_same_stats_across_processes():
+    sides = ({"Warrior": 2, "Spy": 1}, {"Wizard": 3})
+    serial = run_battles(*sides, battles=24, seed=3, workers=1)
+    parallel = run_battles(*sides, battles=24, seed=3, workers=2)
+    assert serial == parallel
+    assert serial.battles == serial.wins_a + serial.wins_b + serial.draws == 24
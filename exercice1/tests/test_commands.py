@@ -0,0 +1,81 @@
+import pytest
+
+from src.rpg.commander import Commander
+from src.rpg.commands import Damage, Move, Rest
+from src.rpg.interfaces import ICombatUnit
+from src.rpg.units import Position
+
+
+def test_tick_applies_coalesced_orders(vectorized):
+    cmd = Commander()
+    w, s = cmd.create_warrior(), cmd.create_spy()
+    squad = cmd.create_group()
+    squad.add(w)
+    squad.add(s)
+
+    cmd.order(Move(w, 1, 1))
+    cmd.order(Move(squad, 2, 2))
+    cmd.order(Move(s, 3, 3))
+    cmd.order(Move(w, 4, 4))
+    cmd.order(Move(squad, 5, 5))  # overrides both unit moves
+    cmd.order(Rest(w, 2))
+    cmd.order(Rest(w, 3))
+    cmd.order(Damage(squad, 5))  # 2 each, every time
+    cmd.order(Damage(squad, 5))
+    cmd.order(Damage(s, 10))
+    cmd.order(Damage(s, 1))
+    assert w.position == Position(0, 0)
+
+    stats = cmd.tick()
+    assert (stats.received, stats.applied, stats.coalesced) == (11, 6, 5)
+    assert [w.position, s.position] == [Position(5, 5), Position(5, 5)]
+    assert [w.hp, s.hp] == [101, 85]
+    assert cmd.units_within(5, 5, 0) == [w, s]
+    assert cmd.tick().received == 0
+
+    with pytest.raises(ValueError):
+        cmd.order(Rest(w, -1))
+
+
+def test_tick_applies_rests_before_damage_whatever_the_order():
+    cmd = Commander()
+    w = cmd.create_warrior()
+    cmd.order(Damage(w, 200))
+    cmd.order(Rest(w, 50))
+    cmd.tick()
+    assert w.hp == 0  # one call at a time would leave it at 50
+
+
+class _Broken(ICombatUnit):
+    def move(self, x: int, y: int) -> None:
+        pass
+
+    def rest(self, d: int) -> None:
+        raise RuntimeError("cannot rest")
+
+    def display(self) -> str:
+        return "broken"
+
+    def attack(self, target: ICombatUnit) -> None:
+        pass
+
+    def take_damage(self, i: int) -> None:
+        pass
+
+
+def test_tick_keeps_unapplied_orders_when_one_raises(vectorized):
+    cmd = Commander()
+    w = cmd.create_warrior()
+    cmd.order(Move(w, 1, 1))
+    cmd.order(Rest(w, 5))
+    cmd.order(Rest(_Broken(), 1))
+    cmd.order(Damage(w, 200))
+
+    with pytest.raises(RuntimeError):
+        cmd.tick()
+    assert (w.position, w.hp) == (Position(1, 1), 100)  # moved, the rest batch and damage still queued
+
+    stats = cmd.tick()
+    assert (stats.received, stats.applied) == (2, 2)
+    assert w.hp == 0
+    assert cmd.tick().received == 0
@@ -0,0 +1,31 @@
+import pytest
+
+from src.rpg.commander import Commander
+
+
+def test_nested_groups_use_cached_plan_and_display(vectorized):
+    cmd = Commander()
+    w, s, z = cmd.create_warrior(), cmd.create_spy(), cmd.create_wizard()
+    squad = cmd.create_group()
+    for unit in (w, s, w):
+        squad.add(unit)
+    legion = cmd.create_group()
+    legion.add(squad)
+    legion.add(z)
+
+    legion.take_damage(25)  # squad gets 12, each of its children 4
+    assert [w.hp, s.hp, z.hp] == [92, 96, 88]
+
+    shown = legion.display()
+    assert legion.display() is shown
+    w.rest(1)
+    assert legion.display() == shown.replace("hp=92", "hp=93")
+    squad.remove(s)
+    assert "Spy" not in legion.display()
+    legion.move(3, 3)
+    assert legion.display().count("pos=(3,3)") == 3
+
+    with pytest.raises(ValueError):
+        squad.add(squad)
+    with pytest.raises(ValueError):
+        squad.add(legion)
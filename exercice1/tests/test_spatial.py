@@ -0,0 +1,28 @@
+import random
+
+from src.rpg.commander import Commander
+
+
+def test_spatial_queries_follow_single_and_group_moves(vectorized):
+    rng = random.Random(7)
+    cmd = Commander(cell_size=8)
+    units = [cmd.create_spy() for _ in range(400)]
+    for u in units:
+        u.move(rng.randint(-100, 100), rng.randint(-100, 100))
+    grp = cmd.create_group()
+    for u in units[:100]:
+        grp.add(u)
+    grp.move(-30, 12)
+
+    def dist2(u, x, y):
+        return (u.position.x - x) ** 2 + (u.position.y - y) ** 2
+
+    for _ in range(50):
+        x, y, r, k = rng.randint(-120, 120), rng.randint(-120, 120), rng.randint(0, 40), rng.randint(1, 8)
+        assert cmd.units_within(x, y, r) == [u for u in units if dist2(u, x, y) <= r * r]
+        assert cmd.units_in_rect(x, y, x + r, y + 2 * r) == [
+            u for u in units if x <= u.position.x <= x + r and y <= u.position.y <= y + 2 * r
+        ]
+        expected = sorted(range(len(units)), key=lambda i: (dist2(units[i], x, y), i))[:k]
+        assert cmd.nearest_units(x, y, k) == [units[i] for i in expected]
+    assert cmd.units_within(-30, 12, 0) == units[:100]
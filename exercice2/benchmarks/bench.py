@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from exercice2.src.florist.loyalty import CarteDeFidelite
+from exercice2.src.florist.models import Facture, Fleur
+from exercice2.src.florist.repositories import CachedJsonRepository, JournalRepository, JsonRepository
+from exercice2.src.florist.serializers import SERIALIZERS, Serializer, data_paths
+from exercice2.src.florist.sqlite_repository import SqliteRepository
+
+from .generators import SCALES, generate_dataset, generate_flowers, write_dataset
+
+BACKENDS: Dict[str, Callable[[Path, Serializer], object]] = {
+    "json": lambda d, s: JsonRepository(*data_paths(d, s), serializer=s),
+    "cached": lambda d, s: CachedJsonRepository(*data_paths(d, s), serializer=s),
+    "journal": lambda d, s: JournalRepository(*data_paths(d, s), serializer=s),
+    "sqlite": lambda d, s: SqliteRepository(d / "florist.db"),
+}
+
+
+def _measure(name: str, group: str, fn: Callable[[int], object], repeat: int, warmup: int = 1) -> dict:
+    # fn gets the iteration number so that write benchmarks can use a fresh item each time
+    for i in range(warmup):
+        fn(i)
+    times = []
+    for i in range(warmup, warmup + repeat):
+        start = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - start)
+    return {
+        "name": name,
+        "group": group,
+        "repeat": repeat,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+    }
+
+
+def bench_repository(repo, flowers: List[Fleur], invoices: List[Facture], repeat: int, seed: int) -> List[dict]:
+    rng = random.Random(seed)
+    flower_id = rng.choice(flowers).id
+    invoice = rng.choice(invoices)
+    extra = generate_flowers(repeat + 1, seed + 99)
+    bouquet_ids = [f.id for f in flowers[:3]]
+    created: List[str] = []
+
+    def create_invoice(_: int) -> None:
+        created.append(repo.create_invoice(invoice.client, date(2026, 6, 1), bouquet_ids).id)
+
+    results = [
+        _measure("list_flowers", "repository", lambda _: repo.list_flowers(), repeat),
+        _measure("get_flower", "repository", lambda _: repo.get_flower(flower_id), repeat),
+        _measure("search_price", "repository", lambda _: repo.search_flowers_price_between(10, 20), repeat),
+        _measure(
+            "search_cut_date",
+            "repository",
+            lambda _: repo.search_flowers_by_cut_date_between("2025-03-01", "2025-03-31"),
+            repeat,
+        ),
+        _measure("search_combined", "repository", lambda _: repo.search_flowers("Rose", "A", 10, 50), repeat),
+        _measure("add_flower", "repository", lambda i: repo.add_flower(extra[i]), repeat),
+        _measure("delete_flower", "repository", lambda i: repo.delete_flower(extra[i].id), repeat),
+        _measure("list_invoices", "repository", lambda _: repo.list_invoices(), repeat),
+        _measure("get_invoice", "repository", lambda _: repo.get_invoice(invoice.id), repeat),
+        _measure("invoices_by_client", "repository", lambda _: repo.invoices_by_client(invoice.client), repeat),
+        _measure("create_invoice", "repository", create_invoice, repeat),
+        _measure("delete_invoice", "repository", lambda i: repo.delete_invoice(created[i]), repeat),
+        _measure("loyalty_summaries", "repository", lambda _: repo.loyalty_summaries(), repeat),
+    ]
+    return results
+
+
+def bench_loyalty(invoices: List[Facture], repeat: int) -> List[dict]:
+    by_client: Dict[str, List[Facture]] = {}
+    for inv in invoices:
+        by_client.setdefault(inv.client, []).append(inv)
+    busiest = max(by_client.values(), key=len)
+
+    def incremental(_: int) -> str:
+        card = CarteDeFidelite(busiest[0].client)
+        for inv in busiest:
+            card.ajouter_facture(inv)
+        return card.niveau
+
+    return [
+        _measure(
+            "cards_for_all_clients",
+            "loyalty",
+            lambda _: [CarteDeFidelite(client, list(invs)).niveau for client, invs in by_client.items()],
+            repeat,
+        ),
+        _measure("card_incremental_busiest_client", "loyalty", incremental, repeat),
+    ]
+
+
+def bench_api(repo, invoices: List[Facture], repeat: int) -> List[dict]:
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError:
+        print("fastapi is not installed: skipping API benchmarks")
+        return []
+    from exercice2.src.florist import api
+
+    api.configure(api.app, repo=repo)
+    client = TestClient(api.app)
+    customer = invoices[0].client
+    etag = client.get("/flowers", params={"limit": 100}).headers["etag"]
+
+    def post_flower(_: int) -> None:
+        r = client.post("/flowers", json={"espece": "Rose", "date_coupe": "2025-06-01", "qualite": "A", "prix": 9.99})
+        client.delete(f"/flowers/{r.json()['id']}")
+
+    def get(path: str, **params) -> Callable[[int], object]:
+        return lambda _: client.get(path, params=params).raise_for_status()
+
+    return [
+        _measure("GET /flowers?limit=100", "api", get("/flowers", limit=100), repeat),
+        _measure(
+            "GET /flowers?limit=100 (304)",
+            "api",
+            lambda _: client.get("/flowers", params={"limit": 100}, headers={"If-None-Match": etag}),
+            repeat,
+        ),
+        _measure("GET /flowers/search/price", "api", get("/flowers/search/price", prix_min=10, prix_max=20), repeat),
+        _measure("GET /flowers/search", "api", get("/flowers/search", espece="Rose", prix_max=20), repeat),
+        _measure("GET /invoices?limit=100", "api", get("/invoices", limit=100), repeat),
+        _measure("GET /loyalty/{client}", "api", get(f"/loyalty/{customer}"), repeat),
+        _measure("POST+DELETE /flowers", "api", post_flower, repeat),
+        *bench_api_concurrent(api.app, repeat),
+    ]
+
+
+def bench_api_concurrent(app, repeat: int, requests: int = 200) -> List[dict]:
+    # mixed traffic (one write for four reads) from many connections at once,
+    # straight through ASGI so that the server's own limits don't interfere
+    import httpx
+
+    body = {"espece": "Rose", "date_coupe": "2025-06-01", "qualite": "A", "prix": 9.99}
+
+    async def traffic(connections: int) -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            semaphore = asyncio.Semaphore(connections)
+
+            async def one(i: int) -> None:
+                async with semaphore:
+                    if i % 5 == 0:
+                        r = await client.post("/flowers", json=body)
+                    else:
+                        r = await client.get("/flowers/search", params={"espece": "ros", "prix_max": 20 + i % 7})
+                    r.raise_for_status()
+
+            await asyncio.gather(*(one(i) for i in range(requests)))
+
+    return [
+        _measure(
+            f"{requests} mixed requests, {connections} connections",
+            "api-concurrent",
+            lambda _, c=connections: asyncio.run(traffic(c)),
+            repeat,
+        )
+        for connections in (1, 16, 64)
+    ]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def run(
+    data_dir: Path,
+    n_flowers: int,
+    n_invoices: int,
+    repository: str = "json",
+    fmt: str = "json",
+    seed: int = 0,
+    repeat: int = 5,
+    api: bool = True,
+) -> dict:
+    serializer = SERIALIZERS[fmt]
+    flowers, invoices = generate_dataset(n_flowers, n_invoices, seed)
+    if repository == "sqlite":
+        repo = SqliteRepository(data_dir / "florist.db")
+        repo.import_data(flowers, invoices)
+    else:
+        write_dataset(*data_paths(data_dir, serializer), flowers, invoices, serializer)
+        repo = BACKENDS[repository](data_dir, serializer)
+
+    try:
+        results = bench_repository(repo, flowers, invoices, repeat, seed)
+        results += bench_loyalty(invoices, repeat)
+        if api:
+            results += bench_api(repo, invoices, repeat)
+    finally:
+        if isinstance(repo, SqliteRepository):
+            repo.close()
+    return {
+        "meta": {
+            "repository": repository,
+            "format": fmt,
+            "flowers": n_flowers,
+            "invoices": n_invoices,
+            "seed": seed,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": _git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the florist repositories, API and loyalty cards.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--flowers", type=int, default=None, help="overrides --scale")
+    parser.add_argument("--invoices", type=int, default=None, help="defaults to the number of flowers")
+    parser.add_argument("--repository", choices=sorted(BACKENDS), default="json")
+    parser.add_argument("--format", choices=sorted(SERIALIZERS), default="json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-api", action="store_true")
+    parser.add_argument("--output", type=Path, default=None, help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    n_flowers = args.flowers or SCALES[args.scale]
+    n_invoices = args.invoices or n_flowers
+    with tempfile.TemporaryDirectory(prefix="florist-bench-") as tmp:
+        report = run(
+            Path(tmp), n_flowers, n_invoices, args.repository, args.format, args.seed, args.repeat, not args.no_api
+        )
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text, encoding="utf-8")
+        print(f"wrote {len(report['results'])} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> List[Tuple[str, float, float, float, str]]:
+    before = {(r["group"], r["name"]): r["median"] for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        key = (r["group"], r["name"])
+        if key not in before:
+            continue
+        ratio = r["median"] / before[key] if before[key] else float("inf")
+        verdict = "slower" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else ""
+        rows.append((f"{key[0]}/{key[1]}", before[key], r["median"], ratio, verdict))
+    return rows
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files (median times).")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change reported as a regression")
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    current = json.loads(args.current.read_text(encoding="utf-8"))
+    for side in ("repository", "format", "flowers", "invoices"):
+        if baseline["meta"].get(side) != current["meta"].get(side):
+            print(f"warning: {side} differs ({baseline['meta'].get(side)} vs {current['meta'].get(side)})")
+
+    rows = compare(baseline, current, args.threshold)
+    width = max((len(r[0]) for r in rows), default=10)
+    print(f"{'benchmark':<{width}}  {'baseline':>10}  {'current':>10}  {'ratio':>6}")
+    for name, old, new, ratio, verdict in rows:
+        print(f"{name:<{width}}  {old * 1000:>8.3f}ms  {new * 1000:>8.3f}ms  {ratio:>6.2f}  {verdict}")
+    if any(verdict == "slower" for *_, verdict in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import random
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Tuple
+
+from exercice2.src.florist.models import Facture, Fleur, fleur_to_dict
+from exercice2.src.florist.serializers import Serializer
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+ESPECES = ["Rose", "Tulipe", "Lys", "Orchidée", "Pivoine", "Tournesol", "Marguerite", "Iris"]
+QUALITES = ["A", "B", "C"]
+FIRST_CUT = date(2025, 1, 1)
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_flowers(n: int, seed: int = 0) -> List[Fleur]:
+    rng = random.Random(seed)
+    return [
+        Fleur.from_trusted(
+            id=_uuid(rng),
+            espece=rng.choice(ESPECES),
+            date_coupe=FIRST_CUT + timedelta(days=rng.randrange(365)),
+            qualite=rng.choice(QUALITES),
+            prix=rng.randrange(1, 100) + 0.99,
+        )
+        for _ in range(n)
+    ]
+
+
+def generate_invoices(flowers: List[Fleur], n: int, seed: int = 0, max_bouquet: int = 5) -> List[Facture]:
+    rng = random.Random(seed + 1)
+    n_clients = max(1, n // 20)
+    invoices = []
+    for _ in range(n):
+        bouquet = [rng.choice(flowers) for _ in range(rng.randint(1, max_bouquet))]
+        last_cut = max(f.date_coupe for f in bouquet)
+        invoices.append(
+            Facture.from_trusted(
+                id=_uuid(rng),
+                client=f"client-{rng.randrange(n_clients):05d}",
+                date_vente=last_cut + timedelta(days=rng.randrange(10)),
+                bouquet=bouquet,
+            )
+        )
+    return invoices
+
+
+def generate_dataset(n_flowers: int, n_invoices: int, seed: int = 0) -> Tuple[List[Fleur], List[Facture]]:
+    flowers = generate_flowers(n_flowers, seed)
+    return flowers, generate_invoices(flowers, n_invoices, seed)
+
+
+def write_dataset(
+    flowers_path: Path, invoices_path: Path, flowers: List[Fleur], invoices: List[Facture], serializer: Serializer
+) -> None:
+    flowers_path.parent.mkdir(parents=True, exist_ok=True)
+    refs = {f.id for f in flowers}
+    serializer.dump(flowers_path, [fleur_to_dict(f) for f in flowers])
+    serializer.dump(invoices_path, [inv.to_dict(refs) for inv in invoices])
@@ -1,20 +1,107 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import date
-from pathlib import Path
-from typing import List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+from fastapi import Body, Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+from .async_repository import AsyncRepository
+from .cache import CachedResponse, ResponseCache, etag_matches, make_etag
+from .config import Repository, Settings, build_repository
+from .loyalty import LoyaltySummary
+from .metrics import CONTENT_TYPE, HTTP_LATENCY, HTTP_REQUESTS, REGISTRY, StackSampler
+from .models import Facture, Fleur, fleur_to_dict
+from .reports import SalesRow
+from .sqlite_repository import SqliteRepository
+
+
+_configure_lock = threading.RLock()
+
+
+def configure(
+    app: FastAPI, settings: Optional[Settings] = None, repo: Optional[Repository] = None
+) -> AsyncRepository:
+    # builds (or installs) the repository and per-repository state; runs from
+    # the lifespan hook, or lazily on the first request when there is none
+    with _configure_lock:
+        settings = settings or Settings.from_env()
+        if repo is None:
+            repo = build_repository(settings)
+        app.state.settings = settings
+        app.state.response_cache = ResponseCache(settings.response_cache_size)
+        app.state.repo = AsyncRepository(repo)
+        return app.state.repo
+
+
+async def get_repo(request: Request) -> AsyncRepository:
+    repo = getattr(request.app.state, "repo", None)
+    if repo is None:
+        with _configure_lock:
+            repo = getattr(request.app.state, "repo", None) or configure(request.app)
+    return repo
+
+
+profiler = StackSampler()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    settings = Settings.from_env()
+    configure(app, settings)
+    if settings.profile:
+        profiler.interval = settings.profile_interval
+        profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        repo = app.state.repo
+        app.state.repo = None
+        await repo.aclose()
+        if isinstance(repo.sync, SqliteRepository):
+            repo.sync.close()
+
+
+app = FastAPI(title="Florist API", version="1.0", lifespan=lifespan)
+
+
+class MetricsMiddleware:
+    # plain ASGI middleware (cheaper than BaseHTTPMiddleware); labels by route
+    # template so that /flowers/{flower_id} stays one series
+    def __init__(self, app) -> None:
+        self.app = app
 
-from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
 
-from .models import Facture, Fleur
-from .repositories import JsonRepository
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
 
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_LATENCY.labels(scope["method"], path).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(scope["method"], path, status).inc()
 
-DATA_DIR = Path("exercice2/data")
-repo = JsonRepository(DATA_DIR / "flowers.json", DATA_DIR / "invoices.json")
 
-app = FastAPI(title="Florist API", version="1.0")
+app.add_middleware(MetricsMiddleware)
 
 
 class FleurIn(BaseModel):
@@ -42,6 +129,50 @@ class FactureOut(BaseModel):
     bouquet: List[FleurOut]
 
 
+class LoyaltyOut(BaseModel):
+    client: str
+    total: float
+    invoice_count: int
+    niveau: str
+
+
+class SalesRowOut(BaseModel):
+    key: str
+    invoice_count: int
+    stems: int
+    revenue_ht: float
+    revenue: float
+
+
+class BulkError(BaseModel):
+    index: int
+    detail: str
+
+
+class FleurBulkOut(BaseModel):
+    created: List[FleurOut]
+    errors: List[BulkError]
+
+
+class FactureBulkOut(BaseModel):
+    created: List[FactureOut]
+    errors: List[BulkError]
+
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def _bulk_item(model: Type[M], item: Any) -> M:
+    # bulk payloads are validated item by item so that one bad item is
+    # reported at its index instead of rejecting the whole batch
+    if not isinstance(item, dict):
+        raise ValueError("item must be a JSON object")
+    try:
+        return model(**item)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())) from None
+
+
 def _fleur_to_out(f: Fleur) -> FleurOut:
     return FleurOut(
         id=f.id,
@@ -52,13 +183,97 @@ def _fleur_to_out(f: Fleur) -> FleurOut:
     )
 
 
+def _facture_to_out(inv: Facture) -> FactureOut:
+    return FactureOut(
+        id=inv.id,
+        client=inv.client,
+        date_vente=inv.date_vente,
+        prix_vente=inv.prix_vente,
+        bouquet=[_fleur_to_out(f) for f in inv.bouquet],
+    )
+
+
+NEXT_PAGE_HEADER = "X-Next-After-Id"
+
+
+def _next_page_headers(page: list, limit: Optional[int]) -> Dict[str, str]:
+    if limit is not None and len(page) == limit:
+        return {NEXT_PAGE_HEADER: page[-1].id}
+    return {}
+
+
+async def _cached_json(
+    request: Request, repo: AsyncRepository, build: Callable[[], Tuple[Any, Dict[str, str]]]
+) -> Response:
+    response_cache = request.app.state.response_cache
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+    def lookup() -> Optional[CachedResponse]:
+        return response_cache.get(key, repo.sync.version)
+
+    def render() -> CachedResponse:
+        # off the loop: the query and the JSON encoding scale with the result
+        version = repo.sync.version
+        content, headers = build()
+        body = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        entry = CachedResponse(body, make_etag(body), headers)
+        response_cache.put(key, version, entry)
+        return entry
+
+    entry = await repo.read(lookup)
+    if entry is None:
+        entry = await asyncio.to_thread(render)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+def _fleurs_or_400(search: Callable[[], List[Fleur]]) -> Tuple[List[FleurOut], Dict[str, str]]:
+    try:
+        return [_fleur_to_out(f) for f in search()], {}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _loyalty_to_out(s: LoyaltySummary) -> LoyaltyOut:
+    return LoyaltyOut(client=s.client, total=s.total, invoice_count=s.invoice_count, niveau=s.niveau)
+
+
+def _sales_row_to_out(r: SalesRow) -> SalesRowOut:
+    return SalesRowOut(
+        key=r.key, invoice_count=r.invoice_count, stems=r.stems, revenue_ht=r.revenue_ht, revenue=r.revenue
+    )
+
+
 @app.get("/flowers", response_model=List[FleurOut])
-def list_flowers() -> List[FleurOut]:
-    return [_fleur_to_out(f) for f in repo.list_flowers()]
+async def list_flowers(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    after_id: Optional[str] = None,
+    repo: AsyncRepository = Depends(get_repo),
+) -> Response:
+    def build() -> Tuple[List[FleurOut], Dict[str, str]]:
+        if limit is None and after_id is None:
+            return [_fleur_to_out(f) for f in repo.sync.list_flowers()], {}
+        page = repo.sync.page_flowers(limit, after_id)
+        return [_fleur_to_out(f) for f in page], _next_page_headers(page, limit)
+
+    return await _cached_json(request, repo, build)
+
+
+@app.get("/flowers/export")
+async def export_flowers(repo: AsyncRepository = Depends(get_repo)) -> StreamingResponse:
+    """One JSON flower per line. The cached, journal and SQLite backends stream
+    page by page; the plain JSON backend parses the whole file before the first
+    line is sent."""
+    flowers = await repo.read(repo.sync.iter_flowers)
+    lines = (json.dumps(fleur_to_dict(f), ensure_ascii=False) + "\n" for f in flowers)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 
 @app.post("/flowers", response_model=FleurOut, status_code=201)
-def create_flower(payload: FleurIn) -> FleurOut:
+async def create_flower(payload: FleurIn, repo: AsyncRepository = Depends(get_repo)) -> FleurOut:
     try:
         f = Fleur(
             espece=payload.espece,
@@ -66,77 +281,212 @@ def create_flower(payload: FleurIn) -> FleurOut:
             qualite=payload.qualite,
             prix=payload.prix,
         )
-        repo.add_flower(f)
+        await repo.add_flower(f)
         return _fleur_to_out(f)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/flowers/bulk", response_model=FleurBulkOut)
+async def create_flowers_bulk(
+    payload: List[Any] = Body(...), repo: AsyncRepository = Depends(get_repo)
+) -> FleurBulkOut:
+    errors: List[BulkError] = []
+    valid: List[Fleur] = []
+    positions: List[int] = []
+    for index, raw in enumerate(payload):
+        try:
+            item = _bulk_item(FleurIn, raw)
+            valid.append(Fleur(espece=item.espece, date_coupe=item.date_coupe, qualite=item.qualite, prix=item.prix))
+            positions.append(index)
+        except ValueError as e:
+            errors.append(BulkError(index=index, detail=str(e)))
+
+    res = await repo.add_flowers(valid)
+    errors.extend(BulkError(index=positions[i], detail=detail) for i, detail in res.errors)
+    errors.sort(key=lambda e: e.index)
+    return FleurBulkOut(created=[_fleur_to_out(f) for f in res.added], errors=errors)
+
+
 @app.delete("/flowers/{flower_id}", status_code=204)
-def delete_flower(flower_id: str) -> None:
-    repo.delete_flower(flower_id)
+async def delete_flower(flower_id: str, repo: AsyncRepository = Depends(get_repo)) -> None:
+    await repo.delete_flower(flower_id)
     return None
 
 
+@app.get("/flowers/search", response_model=List[FleurOut])
+async def search_flowers(
+    request: Request,
+    espece: Optional[str] = None,
+    qualite: Optional[str] = None,
+    prix_min: Optional[float] = Query(None, ge=0),
+    prix_max: Optional[float] = Query(None, ge=0),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    repo: AsyncRepository = Depends(get_repo),
+) -> Response:
+    return await _cached_json(
+        request,
+        repo,
+        lambda: _fleurs_or_400(
+            lambda: repo.sync.search_flowers(espece, qualite, prix_min, prix_max, date_from, date_to)
+        ),
+    )
+
+
 @app.get("/flowers/search/price", response_model=List[FleurOut])
-def search_flowers_price(
+async def search_flowers_price(
+    request: Request,
     prix_min: float = Query(..., ge=0),
     prix_max: float = Query(..., ge=0),
-) -> List[FleurOut]:
-    try:
-        res = repo.search_flowers_price_between(prix_min, prix_max)
-        return [_fleur_to_out(f) for f in res]
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    repo: AsyncRepository = Depends(get_repo),
+) -> Response:
+    return await _cached_json(
+        request, repo, lambda: _fleurs_or_400(lambda: repo.sync.search_flowers_price_between(prix_min, prix_max))
+    )
 
 
 @app.get("/flowers/search/cut-date", response_model=List[FleurOut])
-def search_flowers_cut_date(d: date) -> List[FleurOut]:
-    res = repo.search_flowers_by_cut_date(d)
-    return [_fleur_to_out(f) for f in res]
+async def search_flowers_cut_date(
+    request: Request,
+    d: Optional[date] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    repo: AsyncRepository = Depends(get_repo),
+) -> Response:
+    def search() -> List[Fleur]:
+        if d is not None:
+            return repo.sync.search_flowers_by_cut_date(d)
+        if date_from is not None or date_to is not None:
+            return repo.sync.search_flowers_by_cut_date_between(date_from or date.min, date_to or date.max)
+        raise ValueError("either d or from/to is required")
+
+    return await _cached_json(request, repo, lambda: _fleurs_or_400(search))
 
 
 @app.get("/invoices", response_model=List[FactureOut])
-def list_invoices(client: Optional[str] = None) -> List[FactureOut]:
-    invoices = repo.invoices_by_client(client) if client else repo.list_invoices()
-    out: List[FactureOut] = []
-    for inv in invoices:
-        out.append(
-            FactureOut(
-                id=inv.id,
-                client=inv.client,
-                date_vente=inv.date_vente,
-                prix_vente=inv.prix_vente,
-                bouquet=[_fleur_to_out(f) for f in inv.bouquet],
-            )
-        )
-    return out
+async def list_invoices(
+    response: Response,
+    client: Optional[str] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1),
+    after_id: Optional[str] = None,
+    repo: AsyncRepository = Depends(get_repo),
+) -> List[FactureOut]:
+    paginated = limit is not None or after_id is not None
+    windowed = date_from is not None or date_to is not None
+    if paginated and windowed:
+        raise HTTPException(status_code=400, detail="limit/after_id cannot be combined with from/to")
+
+    def query() -> List[Facture]:
+        if windowed:
+            try:
+                return repo.sync.invoices_between(date_from or date.min, date_to or date.max, client)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        if paginated:
+            return repo.sync.page_invoices(limit, after_id, client)
+        return repo.sync.invoices_by_client(client) if client else repo.sync.list_invoices()
+
+    invoices = await repo.read(query)
+    if paginated:
+        response.headers.update(_next_page_headers(invoices, limit))
+    return [_facture_to_out(inv) for inv in invoices]
+
+
+@app.get("/invoices/export")
+async def export_invoices(client: Optional[str] = None, repo: AsyncRepository = Depends(get_repo)) -> StreamingResponse:
+    """One JSON invoice per line, optionally for one client. As for
+    /flowers/export, only the plain JSON backend loads the whole file first."""
+    invoices = (inv for inv in await repo.read(repo.sync.iter_invoices) if not client or inv.client == client)
+    lines = (json.dumps(inv.to_dict(), ensure_ascii=False) + "\n" for inv in invoices)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 
 @app.post("/invoices", response_model=FactureOut, status_code=201)
-def create_invoice(payload: FactureIn) -> FactureOut:
-    bouquet: List[Fleur] = []
-    for fid in payload.bouquet_ids:
-        f = repo.get_flower(fid)
-        if f is None:
-            raise HTTPException(status_code=400, detail="unknown flower id in bouquet")
-        bouquet.append(f)
-
+async def create_invoice(payload: FactureIn, repo: AsyncRepository = Depends(get_repo)) -> FactureOut:
     try:
-        inv = Facture(client=payload.client, date_vente=payload.date_vente, bouquet=bouquet)
-        repo.add_invoice(inv)
-        return FactureOut(
-            id=inv.id,
-            client=inv.client,
-            date_vente=inv.date_vente,
-            prix_vente=inv.prix_vente,
-            bouquet=[_fleur_to_out(f) for f in inv.bouquet],
-        )
+        inv = await repo.create_invoice(payload.client, payload.date_vente, payload.bouquet_ids)
+        return _facture_to_out(inv)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/invoices/bulk", response_model=FactureBulkOut)
+async def create_invoices_bulk(
+    payload: List[Any] = Body(...), repo: AsyncRepository = Depends(get_repo)
+) -> FactureBulkOut:
+    errors: List[BulkError] = []
+    items: List[Tuple[int, FactureIn]] = []
+    for index, raw in enumerate(payload):
+        try:
+            items.append((index, _bulk_item(FactureIn, raw)))
+        except ValueError as e:
+            errors.append(BulkError(index=index, detail=str(e)))
+
+    flowers = await repo.read(repo.sync.get_flowers, [fid for _, item in items for fid in item.bouquet_ids])
+    valid: List[Facture] = []
+    positions: List[int] = []
+    for index, item in items:
+        try:
+            if any(fid not in flowers for fid in item.bouquet_ids):
+                raise ValueError("unknown flower id in bouquet")
+            bouquet = [flowers[fid] for fid in item.bouquet_ids]
+            valid.append(Facture(client=item.client, date_vente=item.date_vente, bouquet=bouquet))
+            positions.append(index)
+        except ValueError as e:
+            errors.append(BulkError(index=index, detail=str(e)))
+
+    res = await repo.add_invoices(valid)
+    errors.extend(BulkError(index=positions[i], detail=detail) for i, detail in res.errors)
+    errors.sort(key=lambda e: e.index)
+    return FactureBulkOut(created=[_facture_to_out(inv) for inv in res.added], errors=errors)
+
+
 @app.delete("/invoices/{invoice_id}", status_code=204)
-def delete_invoice(invoice_id: str) -> None:
-    repo.delete_invoice(invoice_id)
+async def delete_invoice(invoice_id: str, repo: AsyncRepository = Depends(get_repo)) -> None:
+    await repo.delete_invoice(invoice_id)
     return None
+
+
+@app.get("/loyalty", response_model=List[LoyaltyOut])
+async def list_loyalty(repo: AsyncRepository = Depends(get_repo)) -> List[LoyaltyOut]:
+    return [_loyalty_to_out(s) for s in await repo.read(repo.sync.loyalty_summaries)]
+
+
+@app.get("/loyalty/{client}", response_model=LoyaltyOut)
+async def get_loyalty(client: str, repo: AsyncRepository = Depends(get_repo)) -> LoyaltyOut:
+    summary = await repo.read(repo.sync.loyalty_summary, client)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="unknown client")
+    return _loyalty_to_out(summary)
+
+
+@app.get("/reports/sales", response_model=List[SalesRowOut])
+async def sales_report(
+    group_by: str = "day",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    repo: AsyncRepository = Depends(get_repo),
+) -> List[SalesRowOut]:
+    try:
+        rows = await repo.read(repo.sync.sales_report, group_by, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [_sales_row_to_out(r) for r in rows]
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> Response:
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(reset: bool = False) -> PlainTextResponse:
+    if not profiler.running:
+        raise HTTPException(status_code=404, detail="profiler is off (set FLORIST_PROFILE=1)")
+    body = profiler.collapsed()
+    if reset:
+        profiler.reset()
+    return PlainTextResponse(body)
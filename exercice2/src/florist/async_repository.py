@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from itertools import groupby
+from typing import Any, Callable, Deque, Iterable, List, Optional, Tuple, TypeVar
+
+from .config import Repository
+from .models import Facture, Fleur
+from .repositories import BulkResult, CachedJsonRepository
+
+T = TypeVar("T")
+
+
+def _bulk_outcomes(items: list, result: BulkResult) -> list:
+    errors = dict(result.errors)
+    return [ValueError(errors[i]) if i in errors else item for i, item in enumerate(items)]
+
+
+class AsyncRepository:
+    # Async facade used by the API handlers.
+    # Reads of in-memory repositories (cached, journal) run inline on the event
+    # loop when the repository is idle and up to date with its files; other
+    # reads go to a worker thread, so the loop never waits for a commit or a
+    # reload. Mutations are queued and run in
+    # order by one writer task on a dedicated thread: whatever queues up while a
+    # commit is in flight is committed next, with consecutive add_flower /
+    # create_invoice calls merged into one bulk call (one file write or one
+    # SQLite transaction).
+
+    def __init__(self, sync: Repository, max_batch: int = 256) -> None:
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self.sync = sync
+        self.max_batch = max_batch
+        self.inline_reads = isinstance(sync, CachedJsonRepository)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="florist-writer")
+        self._pending: Deque[Tuple[str, Any, asyncio.Future]] = deque()
+        self._writer: Optional[asyncio.Task] = None
+
+    async def read(self, fn: Callable[..., T], *args: Any) -> T:
+        if self.inline_reads:
+            done, result = self.sync.read_nowait(fn, *args)
+            if done:
+                return result
+        return await asyncio.to_thread(fn, *args)
+
+    async def add_flower(self, flower: Fleur) -> Fleur:
+        return await self._submit("add_flower", flower)
+
+    async def add_flowers(self, flowers: Iterable[Fleur]) -> BulkResult[Fleur]:
+        return await self._submit("add_flowers", list(flowers))
+
+    async def delete_flower(self, flower_id: str) -> None:
+        await self._submit("delete_flower", flower_id)
+
+    async def create_invoice(self, client: str, date_vente: date, bouquet_ids: List[str]) -> Facture:
+        return await self._submit("create_invoice", (client, date_vente, list(bouquet_ids)))
+
+    async def add_invoices(self, invoices: Iterable[Facture]) -> BulkResult[Facture]:
+        return await self._submit("add_invoices", list(invoices))
+
+    async def delete_invoice(self, invoice_id: str) -> None:
+        await self._submit("delete_invoice", invoice_id)
+
+    async def aclose(self) -> None:
+        # waits for queued writes, then stops the writer thread
+        writer = self._writer
+        if writer is not None and writer.get_loop() is asyncio.get_running_loop():
+            await writer
+        self._executor.shutdown(wait=True)
+
+    async def _submit(self, op: str, arg: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((op, arg, future))
+        # the writer exits once the queue is empty (and is bound to its loop:
+        # a TestClient without lifespan runs every request on a fresh loop)
+        if self._writer is None or self._writer.done() or self._writer.get_loop() is not loop:
+            self._writer = loop.create_task(self._drain())
+        return await future
+
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            for op, items in groupby(batch, key=lambda item: item[0]):
+                group = list(items)
+                args = [arg for _, arg, _ in group]
+                try:
+                    outcomes = await loop.run_in_executor(self._executor, self._commit, op, args)
+                except Exception as e:
+                    outcomes = [e] * len(group)
+                for (_, _, future), outcome in zip(group, outcomes):
+                    if future.done():
+                        continue
+                    if isinstance(outcome, Exception):
+                        future.set_exception(outcome)
+                    else:
+                        future.set_result(outcome)
+
+    def _commit(self, op: str, args: list) -> list:
+        # runs on the writer thread; returns one result or exception per call
+        if op == "add_flower":
+            return _bulk_outcomes(args, self.sync.add_flowers(args))
+        if op == "create_invoice":
+            return self._create_invoices(args)
+        method = getattr(self.sync, op)
+        outcomes = []
+        for arg in args:
+            try:
+                outcomes.append(method(arg))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    def _create_invoices(self, args: List[Tuple[str, date, List[str]]]) -> list:
+        flowers = self.sync.get_flowers(fid for _, _, ids in args for fid in ids)
+        outcomes: list = []
+        valid: List[Facture] = []
+        positions: List[int] = []
+        for client, date_vente, ids in args:
+            try:
+                if any(fid not in flowers for fid in ids):
+                    raise ValueError("unknown flower id in bouquet")
+                valid.append(Facture(client=client, date_vente=date_vente, bouquet=[flowers[fid] for fid in ids]))
+                positions.append(len(outcomes))
+                outcomes.append(None)
+            except ValueError as e:
+                outcomes.append(e)
+        for position, outcome in zip(positions, _bulk_outcomes(valid, self.sync.add_invoices(valid))):
+            outcomes[position] = outcome
+        return outcomes
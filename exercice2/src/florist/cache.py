@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Optional
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 256) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self, version: int) -> bool:
+        # entries are only valid for the newest repository version seen
+        if self._version is not None and version < self._version:
+            return False
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        return True
+
+    def get(self, key: Hashable, version: int) -> Optional[CachedResponse]:
+        with self._lock:
+            if not self._check_version(version):
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, version: int, entry: CachedResponse) -> None:
+        with self._lock:
+            if not self._check_version(version):
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
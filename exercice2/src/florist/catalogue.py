@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import math
+from array import array
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from .models import Fleur, _to_cents
+
+try:
+    import numpy as np
+except ImportError:  # optional: masks fall back to plain loops over the columns
+    np = None
+
+
+class FlowerCatalogue:
+    def __init__(self, flowers: Iterable[Fleur] = ()) -> None:
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._cents = array("q")
+        self._days = array("i")
+        for f in flowers:
+            self.add(f)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, flower_id: object) -> bool:
+        return flower_id in self._rows
+
+    def add(self, flower: Fleur) -> None:
+        if flower.id in self._rows:
+            raise ValueError("flower id already exists")
+        self._rows[flower.id] = len(self._ids)
+        self._ids.append(flower.id)
+        self._cents.append(_to_cents(flower.prix))
+        self._days.append(flower.date_coupe.toordinal())
+
+    def remove(self, flower_id: str) -> None:
+        row = self._rows.pop(flower_id)
+        last = len(self._ids) - 1
+        if row != last:
+            moved = self._ids[last]
+            self._ids[row] = moved
+            self._rows[moved] = row
+            for column in (self._cents, self._days):
+                column[row] = column[last]
+        for column in (self._ids, self._cents, self._days):
+            column.pop()
+
+    def filter(
+        self,
+        prix_min: Optional[float] = None,
+        prix_max: Optional[float] = None,
+        debut: Optional[date] = None,
+        fin: Optional[date] = None,
+    ) -> List[str]:
+        conditions = []
+        if prix_min is not None or prix_max is not None:
+            lo = -(2**63) if prix_min is None else math.ceil(round(prix_min * 100, 6))
+            hi = 2**63 - 1 if prix_max is None else math.floor(round(prix_max * 100, 6))
+            conditions.append((self._cents, lo, hi))
+        if debut is not None or fin is not None:
+            lo = 1 if debut is None else debut.toordinal()
+            hi = date.max.toordinal() if fin is None else fin.toordinal()
+            conditions.append((self._days, lo, hi))
+        return [self._ids[r] for r in self._matching_rows(conditions)]
+
+    def _matching_rows(self, conditions: list) -> Iterable[int]:
+        n = len(self._ids)
+        if not conditions or n == 0:
+            return range(n)
+        if np is not None:
+            mask = np.ones(n, dtype=bool)
+            for column, lo, hi in conditions:
+                # copy rather than frombuffer: a live buffer export would make a
+                # concurrent add()/remove() on the array fail with BufferError
+                values = np.array(column)
+                mask &= (values >= lo) & (values <= hi) if lo != hi else values == lo
+            return np.flatnonzero(mask).tolist()
+        rows: Iterable[int] = range(n)
+        for column, lo, hi in conditions:
+            rows = [r for r in rows if lo <= column[r] <= hi]
+        return rows
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Mapping, Optional, Union
+
+from .repositories import CachedJsonRepository, JournalRepository, JsonRepository
+from .serializers import SERIALIZERS, data_paths
+from .sqlite_repository import SqliteRepository
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+
+Repository = Union[JsonRepository, SqliteRepository]
+
+
+def _flag(value: Optional[str]) -> bool:
+    return value is not None and value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    data_dir: Path = DEFAULT_DATA_DIR
+    repository: str = "json"
+    format: str = "json"
+    preload: bool = False
+    response_cache_size: int = 256
+    profile: bool = False
+    profile_interval: float = 0.01
+
+    def __post_init__(self) -> None:
+        if self.repository not in REPOSITORIES:
+            raise ValueError(f"repository must be one of {', '.join(sorted(REPOSITORIES))}")
+        if self.format not in SERIALIZERS:
+            raise ValueError(f"format must be one of {', '.join(sorted(SERIALIZERS))}")
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "Settings":
+        return cls(
+            data_dir=Path(environ.get("FLORIST_DATA_DIR", DEFAULT_DATA_DIR)),
+            repository=environ.get("FLORIST_REPOSITORY", "json"),
+            format=environ.get("FLORIST_FORMAT", "json"),
+            preload=_flag(environ.get("FLORIST_PRELOAD")),
+            response_cache_size=int(environ.get("FLORIST_RESPONSE_CACHE_SIZE", "256")),
+            profile=_flag(environ.get("FLORIST_PROFILE")),
+            profile_interval=float(environ.get("FLORIST_PROFILE_INTERVAL", "0.01")),
+        )
+
+
+def _json_backend(cls: type) -> Callable[[Settings], Repository]:
+    def build(settings: Settings) -> Repository:
+        serializer = SERIALIZERS[settings.format]
+        return cls(*data_paths(settings.data_dir, serializer), serializer=serializer)
+
+    return build
+
+
+REPOSITORIES: Dict[str, Callable[[Settings], Repository]] = {
+    "json": _json_backend(JsonRepository),
+    "cached": _json_backend(CachedJsonRepository),
+    "journal": _json_backend(JournalRepository),
+    "sqlite": lambda settings: SqliteRepository(settings.data_dir / "florist.db"),
+}
+
+
+def build_repository(settings: Settings) -> Repository:
+    repo = REPOSITORIES[settings.repository](settings)
+    if settings.preload:
+        repo.preload()
+    return repo
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .config import Settings
+from .locking import file_lock
+from .repositories import JournalRepository, _journal_path
+from .serializers import SERIALIZERS, Serializer, data_paths, load_records
+
+
+def convert_file(source: Path, target: Path, serializer: Serializer) -> int:
+    with file_lock(source):
+        records = load_records(source)
+        serializer.dump(target, records)
+    return len(records)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rewrite flowers/invoices data files in another on-disk format.")
+    # same store as the API: FLORIST_DATA_DIR, else the package's data directory
+    parser.add_argument("--data-dir", type=Path, default=Settings.from_env().data_dir)
+    parser.add_argument("--from", dest="source", choices=sorted(SERIALIZERS), default="json")
+    parser.add_argument("--to", dest="target", choices=sorted(SERIALIZERS), required=True)
+    args = parser.parse_args(argv)
+
+    source, target = SERIALIZERS[args.source], SERIALIZERS[args.target]
+    sources = data_paths(args.data_dir, source)
+    if any(_journal_path(p).exists() for p in sources):
+        # fold pending journal records into the snapshots before converting them
+        JournalRepository(*sources, serializer=source).compact()
+    for src, dst in zip(sources, data_paths(args.data_dir, target)):
+        n = convert_file(src, dst, target)
+        print(f"wrote {n} records from {src} to {dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+_WORD = re.compile(r"\w+")
+
+
+class SortedIndex:
+    def __init__(self, entries: Iterable[Tuple[Any, str]] = ()) -> None:
+        pairs = sorted(entries, key=lambda e: e[0])
+        self._keys: List[Any] = [k for k, _ in pairs]
+        self._ids: List[str] = [i for _, i in pairs]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Any, item_id: str) -> None:
+        pos = bisect_right(self._keys, key)
+        self._keys.insert(pos, key)
+        self._ids.insert(pos, item_id)
+
+    def remove(self, key: Any, item_id: str) -> None:
+        lo = bisect_left(self._keys, key)
+        hi = bisect_right(self._keys, key, lo)
+        pos = self._ids.index(item_id, lo, hi)
+        del self._keys[pos]
+        del self._ids[pos]
+
+    def range(self, lo: Any, hi: Any) -> List[str]:
+        return self._ids[bisect_left(self._keys, lo) : bisect_right(self._keys, hi)]
+
+    def count_range(self, lo: Any, hi: Any) -> int:
+        return bisect_right(self._keys, hi) - bisect_left(self._keys, lo)
+
+    def after(self, key: Optional[Any], limit: Optional[int] = None) -> List[str]:
+        start = 0 if key is None else bisect_right(self._keys, key)
+        stop = None if limit is None else start + limit
+        return self._ids[start:stop]
+
+
+# Text search: values and queries are case-folded and split into word tokens;
+# every query term must be a prefix of some token of the value, so "ros"
+# matches "Rose" and "anc" matches "Rose ancienne".
+
+
+def text_tokens(value: str) -> Set[str]:
+    return set(_WORD.findall(value.casefold()))
+
+
+def query_terms(query: str) -> Set[str]:
+    terms = text_tokens(query)
+    if not terms:
+        raise ValueError("search text must contain a letter or digit")
+    return terms
+
+
+def text_matches(value: str, query: str) -> bool:
+    tokens = text_tokens(value)
+    return all(any(t.startswith(term) for t in tokens) for term in query_terms(query))
+
+
+class InvertedIndex:
+    def __init__(self, entries: Iterable[Tuple[str, str]] = ()) -> None:
+        self._postings: Dict[str, Set[str]] = {}
+        for value, item_id in entries:
+            for term in text_tokens(value):
+                self._postings.setdefault(term, set()).add(item_id)
+        # sorted terms: the terms starting with a prefix are one contiguous slice
+        self._terms: List[str] = sorted(self._postings)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def add(self, value: str, item_id: str) -> None:
+        for term in text_tokens(value):
+            ids = self._postings.get(term)
+            if ids is None:
+                ids = self._postings[term] = set()
+                insort(self._terms, term)
+            ids.add(item_id)
+
+    def remove(self, value: str, item_id: str) -> None:
+        for term in text_tokens(value):
+            ids = self._postings.get(term)
+            if ids is None:
+                continue
+            ids.discard(item_id)
+            if not ids:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def _prefix(self, prefix: str) -> Set[str]:
+        out: Set[str] = set()
+        for i in range(bisect_left(self._terms, prefix), len(self._terms)):
+            term = self._terms[i]
+            if not term.startswith(prefix):
+                break
+            out |= self._postings[term]
+        return out
+
+    def search(self, query: str) -> Set[str]:
+        result: Optional[Set[str]] = None
+        # longer prefixes match fewer terms: start with them to shrink the result early
+        for term in sorted(query_terms(query), key=len, reverse=True):
+            ids = self._prefix(term)
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result or set()
@@ -1,17 +1,33 @@
 from __future__ import annotations
 
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass, field
 from datetime import date
 from typing import List
 
-from .models import Facture
+from .models import Facture, _to_cents
+
+
+def niveau_pour_total(total: float) -> str:
+    if total < 200:
+        return "Bronze"
+    if total < 500:
+        return "Argent"
+    if total < 2000:
+        return "Or"
+    return "Or"
 
 
 @dataclass
 class CarteDeFidelite:
+    # the total and the sale-date order are kept alongside `factures`: change
+    # the history through ajouter_facture / reset_historique, not the list
     client: str
     factures: List[Facture] = field(default_factory=list)
     niveau: str = field(init=False, default="Bronze")
+    _total_centimes: int = field(init=False, default=0, repr=False, compare=False)
+    _par_date: List[Facture] = field(init=False, default_factory=list, repr=False, compare=False)
+    _jours: List[int] = field(init=False, default_factory=list, repr=False, compare=False)
 
     def __post_init__(self) -> None:
         if not self.client or not self.client.strip():
@@ -19,29 +35,62 @@ class CarteDeFidelite:
         for f in self.factures:
             if f.client != self.client:
                 raise ValueError("all invoices must belong to the card owner")
+        self._total_centimes = sum(_to_cents(f.prix_vente) for f in self.factures)
+        self._par_date = sorted(self.factures, key=lambda f: f.date_vente)
+        self._jours = [f.date_vente.toordinal() for f in self._par_date]
         self.niveau = self.calculer_niveau()
 
     def ajouter_facture(self, f: Facture) -> None:
         if f.client != self.client:
             raise ValueError("invoice client must match card owner")
         self.factures.append(f)
+        jour = f.date_vente.toordinal()
+        pos = bisect_right(self._jours, jour)
+        self._jours.insert(pos, jour)
+        self._par_date.insert(pos, f)
+        self._total_centimes += _to_cents(f.prix_vente)
         self.niveau = self.calculer_niveau()
 
     def reset_historique(self) -> None:
         self.factures.clear()
+        self._par_date.clear()
+        self._jours.clear()
+        self._total_centimes = 0
         self.niveau = "Bronze"
 
+    @property
+    def total(self) -> float:
+        return self._total_centimes / 100
+
     def calculer_niveau(self) -> str:
-        total = sum(f.prix_vente for f in self.factures)
-        if total < 200:
-            return "Bronze"
-        if total < 500:
-            return "Argent"
-        if total < 2000:
-            return "Or"
-        return "Or"
+        return niveau_pour_total(self.total)
 
     def factures_entre(self, debut: date, fin: date) -> List[Facture]:
         if debut > fin:
             raise ValueError("debut must be <= fin")
-        return [f for f in self.factures if debut <= f.date_vente <= fin]
+        lo = bisect_left(self._jours, debut.toordinal())
+        hi = bisect_right(self._jours, fin.toordinal(), lo)
+        return self._par_date[lo:hi]
+
+
+@dataclass
+class LoyaltySummary:
+    client: str
+    total_centimes: int = 0
+    invoice_count: int = 0
+
+    @property
+    def total(self) -> float:
+        return self.total_centimes / 100
+
+    @property
+    def niveau(self) -> str:
+        return niveau_pour_total(self.total)
+
+    def add(self, f: Facture) -> None:
+        self.total_centimes += _to_cents(f.prix_vente)
+        self.invoice_count += 1
+
+    def remove(self, f: Facture) -> None:
+        self.total_centimes -= _to_cents(f.prix_vente)
+        self.invoice_count -= 1
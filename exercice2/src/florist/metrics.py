@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import re
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Minimal Prometheus-style metrics (text exposition format 0.0.4), so the API
+# can expose /metrics without extra dependencies.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None
+    ) -> None:
+        if not re.fullmatch(r"[a-zA-Z_:][a-zA-Z0-9_:]*", name):
+            raise ValueError(f"invalid metric name: {name}")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    @abstractmethod
+    def _new_child(self) -> object:
+        pass
+
+    def labels(self, *values: object, **kwargs: object):
+        if kwargs:
+            values = tuple(kwargs[n] for n in self.labelnames)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        pass
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def value(self, *values: object) -> float:
+        return self.labels(*values).value
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in sorted(self._children.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        registry: Optional["Registry"] = None,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in sorted(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = Counter(
+    "florist_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "florist_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+STORAGE_READS = Counter("florist_storage_reads_total", "Data file reads.", ("file",))
+STORAGE_READ_BYTES = Counter("florist_storage_read_bytes_total", "Bytes read from data files.", ("file",))
+STORAGE_WRITES = Counter("florist_storage_writes_total", "Data file writes and journal appends.", ("file",))
+STORAGE_WRITE_BYTES = Counter("florist_storage_write_bytes_total", "Bytes written to data files.", ("file",))
+STORAGE_PARSE = Histogram(
+    "florist_storage_parse_seconds", "Time spent decoding data files (JSON / snapshot).", ("file",)
+)
+STORAGE_DECODE = Histogram(
+    "florist_storage_decode_seconds", "Time spent building Fleur/Facture objects from decoded records.", ("file",)
+)
+STORAGE_ENCODE = Histogram(
+    "florist_storage_encode_seconds", "Time spent encoding records before a data file write.", ("file",)
+)
+PROFILE_SAMPLES = Counter("florist_profile_samples_total", "Stacks recorded by the sampling profiler.")
+
+_PACKAGE_DIR = str(Path(__file__).parent)
+
+
+class StackSampler:
+    # Sampling profiler: a background thread snapshots every thread's stack
+    # each `interval` seconds and counts the stacks that run florist code.
+    # collapsed() returns them in the folded format read by flamegraph.pl
+    # and speedscope. Costs nothing until start() is called.
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64) -> None:
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.interval = interval
+        self.max_depth = max_depth
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="florist-stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample_once(self) -> None:
+        me = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack: List[str] = []
+            ours = False
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                ours = ours or code.co_filename.startswith(_PACKAGE_DIR)
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if ours:
+                key = ";".join(reversed(stack))
+                with self._lock:
+                    self._counts[key] = self._counts.get(key, 0) + 1
+                PROFILE_SAMPLES.inc()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample_once()
+
+    def collapsed(self) -> str:
+        with self._lock:
+            items = sorted(self._counts.items())
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+from .config import Settings
+from .repositories import JournalRepository, JsonRepository, _journal_path
+from .serializers import SERIALIZERS, Serializer, data_paths
+from .sqlite_repository import SqliteRepository
+
+
+def migrate_json_to_sqlite(
+    flowers_path: Path, invoices_path: Path, db_path: Path, force: bool = False
+) -> Tuple[int, int]:
+    # the data files may be in any serializer format (reads sniff it)
+    if not flowers_path.exists() and not invoices_path.exists():
+        raise FileNotFoundError(f"neither {flowers_path} nor {invoices_path} exists")
+    source = JsonRepository(flowers_path, invoices_path)
+    flowers = source.list_flowers()
+    invoices = source.list_invoices()
+
+    target = SqliteRepository(db_path)
+    try:
+        if not force and not target.is_empty():
+            raise ValueError(f"{db_path} already holds data; pass --force to replace it")
+        target.import_data(flowers, invoices, replace=force)
+    finally:
+        target.close()
+    return len(flowers), len(invoices)
+
+
+def source_paths(data_dir: Path, preferred: str = "json") -> Tuple[Path, Path, Serializer]:
+    # the configured format's files when present, else the first format found
+    for name in (preferred, *SERIALIZERS):
+        serializer = SERIALIZERS[name]
+        paths = data_paths(data_dir, serializer)
+        if any(p.exists() for p in paths):
+            return (*paths, serializer)
+    raise FileNotFoundError(f"no flowers/invoices data files in {data_dir}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    settings = Settings.from_env()
+    parser = argparse.ArgumentParser(description="Import the flowers / invoices data files into a SQLite database.")
+    # same store as the API: FLORIST_DATA_DIR, else the package's data directory
+    parser.add_argument("--data-dir", type=Path, default=settings.data_dir)
+    parser.add_argument("--format", choices=sorted(SERIALIZERS), default=settings.format)
+    parser.add_argument("--db", type=Path, default=None)
+    parser.add_argument("--force", action="store_true", help="replace the content of an existing database")
+    args = parser.parse_args(argv)
+
+    db_path = args.db or args.data_dir / "florist.db"
+    try:
+        flowers_path, invoices_path, serializer = source_paths(args.data_dir, args.format)
+        if any(_journal_path(p).exists() for p in (flowers_path, invoices_path)):
+            # fold pending journal records into the snapshots first
+            JournalRepository(flowers_path, invoices_path, serializer=serializer).compact()
+        n_flowers, n_invoices = migrate_json_to_sqlite(flowers_path, invoices_path, db_path, args.force)
+    except (FileNotFoundError, ValueError) as e:
+        raise SystemExit(f"migrate: {e}")
+    print(f"imported {n_flowers} flowers and {n_invoices} invoices from {flowers_path.parent} into {db_path}")
+
+
+if __name__ == "__main__":
+    main()
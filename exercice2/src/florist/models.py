@@ -2,19 +2,26 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from datetime import date, datetime
-from typing import List
+from typing import Container, Dict, List, Optional
 from uuid import uuid4
 
 
 def _parse_date(value: str | date) -> date:
     if isinstance(value, date):
         return value
-    return datetime.strptime(value, "%Y-%m-%d").date()
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        # strptime also accepts unpadded months/days
+        return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _to_cents(value: float) -> int:
+    return int(round(value * 100))
 
 
 def _is_price_ending_99(value: float) -> bool:
-    cents = int(round(value * 100))
-    return cents % 100 == 99
+    return _to_cents(value) % 100 == 99
 
 
 @dataclass(frozen=True)
@@ -35,6 +42,17 @@ class Fleur:
         if not _is_price_ending_99(self.prix):
             raise ValueError("prix must end with .99")
 
+    @classmethod
+    def from_trusted(cls, id: str, espece: str, date_coupe: date, qualite: str, prix: float) -> "Fleur":
+        # already validated data (e.g. read back from our own storage): skip __post_init__
+        obj = object.__new__(cls)
+        object.__setattr__(obj, "espece", espece)
+        object.__setattr__(obj, "date_coupe", date_coupe)
+        object.__setattr__(obj, "qualite", qualite)
+        object.__setattr__(obj, "prix", prix)
+        object.__setattr__(obj, "id", id)
+        return obj
+
 
 @dataclass
 class Facture:
@@ -64,17 +82,30 @@ class Facture:
         return round(total_ttc, 2)
 
     @staticmethod
-    def from_dict(data: dict) -> "Facture":
-        bouquet = [
-            Fleur(
-                id=f["id"],
-                espece=f["espece"],
-                date_coupe=_parse_date(f["date_coupe"]),
-                qualite=f["qualite"],
-                prix=float(f["prix"]),
+    def from_trusted(
+        id: str, client: str, date_vente: date, bouquet: List[Fleur], prix_vente: Optional[float] = None
+    ) -> "Facture":
+        obj = object.__new__(Facture)
+        obj.id = id
+        obj.client = client
+        obj.date_vente = date_vente
+        obj.bouquet = bouquet
+        obj.prix_vente = obj.calculer_prix_vente() if prix_vente is None else prix_vente
+        return obj
+
+    @staticmethod
+    def from_dict(data: dict, flowers: Optional[Dict[str, Fleur]] = None, trusted: bool = False) -> "Facture":
+        if flowers is None:
+            flowers = {}
+        bouquet = [_bouquet_line_from_dict(line, flowers, trusted) for line in data["bouquet"]]
+        if trusted:
+            return Facture.from_trusted(
+                id=data["id"],
+                client=data["client"],
+                date_vente=_parse_date(data["date_vente"]),
+                bouquet=bouquet,
+                prix_vente=data.get("prix_vente"),
             )
-            for f in data["bouquet"]
-        ]
         obj = Facture(
             id=data.get("id", str(uuid4())),
             client=data["client"],
@@ -83,26 +114,48 @@ class Facture:
         )
         return obj
 
-    def to_dict(self) -> dict:
+    def to_dict(self, refs: Container[str] = ()) -> dict:
         return {
             "id": self.id,
             "client": self.client,
             "date_vente": self.date_vente.isoformat(),
-            "bouquet": [
-                {
-                    "id": f.id,
-                    "espece": f.espece,
-                    "date_coupe": f.date_coupe.isoformat(),
-                    "qualite": f.qualite,
-                    "prix": f.prix,
-                }
-                for f in self.bouquet
-            ],
+            "bouquet": [{"id": f.id, "prix": f.prix} if f.id in refs else fleur_to_dict(f) for f in self.bouquet],
             "prix_vente": self.prix_vente,
         }
 
 
-def fleur_from_dict(data: dict) -> Fleur:
+def _bouquet_line_from_dict(line: dict, flowers: Dict[str, Fleur], trusted: bool) -> Fleur:
+    # a line is either a full flower or a {"id", "prix"} reference into the catalogue;
+    # `flowers` is the identity map, so each flower id is built at most once per load
+    prix = float(line["prix"])
+    if "espece" not in line:
+        return _bouquet_ref(flowers, line["id"], prix)
+    f = flowers.get(line["id"])
+    if f is not None and f.prix == prix and f.espece == line["espece"] and f.qualite == line["qualite"]:
+        return f
+    f = fleur_from_dict(line, trusted)
+    flowers.setdefault(f.id, f)
+    return f
+
+
+def _bouquet_ref(flowers: Dict[str, Fleur], flower_id: str, prix: float) -> Fleur:
+    f = flowers.get(flower_id)
+    if f is None:
+        raise ValueError("invoice references unknown flower")
+    if f.prix != prix:
+        f = Fleur.from_trusted(id=f.id, espece=f.espece, date_coupe=f.date_coupe, qualite=f.qualite, prix=prix)
+    return f
+
+
+def fleur_from_dict(data: dict, trusted: bool = False) -> Fleur:
+    if trusted:
+        return Fleur.from_trusted(
+            id=data["id"],
+            espece=data["espece"],
+            date_coupe=_parse_date(data["date_coupe"]),
+            qualite=data["qualite"],
+            prix=float(data["prix"]),
+        )
     return Fleur(
         id=data.get("id", str(uuid4())),
         espece=data["espece"],
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .models import Facture, _to_cents
+
+
+GROUP_BY = ("day", "species", "quality", "client")
+
+# one rollup row: [pre-tax revenue in cents, invoice count, stem count]
+_Row = List[int]
+
+
+@dataclass
+class SalesRow:
+    key: str
+    revenue_ht_centimes: int
+    invoice_count: int
+    stems: int
+
+    @property
+    def revenue_ht(self) -> float:
+        return self.revenue_ht_centimes / 100
+
+    @property
+    def revenue(self) -> float:
+        return round(self.revenue_ht_centimes * (1.0 + Facture.TVA)) / 100
+
+
+def _invoice_rows(inv: Facture) -> List[Tuple[str, str, int, int]]:
+    species: Dict[str, List[int]] = {}
+    quality: Dict[str, List[int]] = {}
+    total = 0
+    for f in inv.bouquet:
+        cents = _to_cents(f.prix)
+        total += cents
+        for per_key, key in ((species, f.espece), (quality, f.qualite)):
+            acc = per_key.setdefault(key, [0, 0])
+            acc[0] += cents
+            acc[1] += 1
+    stems = len(inv.bouquet)
+    rows = [("day", inv.date_vente.isoformat(), total, stems), ("client", inv.client, total, stems)]
+    rows.extend(("species", k, c, n) for k, (c, n) in species.items())
+    rows.extend(("quality", k, c, n) for k, (c, n) in quality.items())
+    return rows
+
+
+# Reports over a date range merge daily buckets: O(days in range x keys)
+# instead of a pass over every invoice.
+class SalesRollup:
+    def __init__(self, invoices: Iterable[Facture] = ()) -> None:
+        self._days: List[int] = []
+        self._buckets: Dict[int, Dict[str, Dict[str, _Row]]] = {}
+        self.rebuild(invoices)
+
+    def rebuild(self, invoices: Iterable[Facture]) -> None:
+        buckets: Dict[int, Dict[str, Dict[str, _Row]]] = {}
+        for inv in invoices:
+            bucket = buckets.get(inv.date_vente.toordinal())
+            if bucket is None:
+                bucket = buckets[inv.date_vente.toordinal()] = {g: {} for g in GROUP_BY}
+            for group, key, cents, stems in _invoice_rows(inv):
+                row = bucket[group].get(key)
+                if row is None:
+                    bucket[group][key] = [cents, 1, stems]
+                else:
+                    row[0] += cents
+                    row[1] += 1
+                    row[2] += stems
+        self._buckets = buckets
+        self._days = sorted(buckets)
+
+    def add(self, inv: Facture) -> None:
+        self._apply(inv, 1)
+
+    def remove(self, inv: Facture) -> None:
+        self._apply(inv, -1)
+
+    def _apply(self, inv: Facture, sign: int) -> None:
+        day = inv.date_vente.toordinal()
+        bucket = self._buckets.get(day)
+        if bucket is None:
+            bucket = self._buckets[day] = {g: {} for g in GROUP_BY}
+            insort(self._days, day)
+        for group, key, cents, stems in _invoice_rows(inv):
+            row = bucket[group].setdefault(key, [0, 0, 0])
+            row[0] += sign * cents
+            row[1] += sign
+            row[2] += sign * stems
+            if row[1] == 0:
+                del bucket[group][key]
+        if not bucket["day"]:
+            del self._buckets[day]
+            del self._days[bisect_left(self._days, day)]
+
+    def report(self, group_by: str, debut: Optional[date] = None, fin: Optional[date] = None) -> List[SalesRow]:
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+        if debut is not None and fin is not None and debut > fin:
+            raise ValueError("debut must be <= fin")
+        lo = 0 if debut is None else bisect_left(self._days, debut.toordinal())
+        hi = len(self._days) if fin is None else bisect_right(self._days, fin.toordinal())
+
+        merged: Dict[str, _Row] = {}
+        for day in self._days[lo:hi]:
+            for key, (cents, count, stems) in self._buckets[day][group_by].items():
+                row = merged.setdefault(key, [0, 0, 0])
+                row[0] += cents
+                row[1] += count
+                row[2] += stems
+        return [SalesRow(key, *merged[key]) for key in sorted(merged)]
@@ -1,43 +1,139 @@
 from __future__ import annotations
 
 import json
-from dataclasses import asdict
-from datetime import date, datetime
+import math
+import os
+import threading
+from bisect import bisect_right
+from dataclasses import asdict, dataclass, field, replace
+from datetime import date
+from functools import wraps
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Callable, Dict, Generic, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
 
-from .models import Facture, Fleur, fleur_from_dict, fleur_to_dict
+from .catalogue import FlowerCatalogue
+from .indexes import InvertedIndex, SortedIndex, query_terms, text_matches
+from .locking import file_lock
+from .loyalty import LoyaltySummary
+from .metrics import STORAGE_READ_BYTES, STORAGE_READS, STORAGE_WRITE_BYTES, STORAGE_WRITES
+from .models import Facture, Fleur, _parse_date, _to_cents, fleur_from_dict, fleur_to_dict
+from .reports import SalesRollup, SalesRow
+from .serializers import SERIALIZERS, Serializer, load_flowers, load_invoices
 
 
-def _parse_date(value: str | date) -> date:
-    if isinstance(value, date):
-        return value
-    return datetime.strptime(value, "%Y-%m-%d").date()
+def _check_search_bounds(
+    prix_min: Optional[float],
+    prix_max: Optional[float],
+    debut: Optional[str | date],
+    fin: Optional[str | date],
+) -> Tuple[Optional[date], Optional[date]]:
+    if prix_min is not None and prix_max is not None and prix_min > prix_max:
+        raise ValueError("prix_min must be <= prix_max")
+    debut = None if debut is None else _parse_date(debut)
+    fin = None if fin is None else _parse_date(fin)
+    if debut is not None and fin is not None and debut > fin:
+        raise ValueError("debut must be <= fin")
+    return debut, fin
+
+
+def _in_bounds(
+    f: Fleur,
+    prix_min: Optional[float],
+    prix_max: Optional[float],
+    debut: Optional[date],
+    fin: Optional[date],
+) -> bool:
+    return (
+        (prix_min is None or prix_min <= f.prix)
+        and (prix_max is None or f.prix <= prix_max)
+        and (debut is None or debut <= f.date_coupe)
+        and (fin is None or f.date_coupe <= fin)
+    )
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+T = TypeVar("T")
+
+
+def _locked(method: F) -> F:
+    # holds the repository's in-process lock for the whole call (file_lock only
+    # serializes other processes)
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return locked  # type: ignore[return-value]
+
+
+def _keyset_page(items: List[T], limit: Optional[int], after_id: Optional[str]) -> List[T]:
+    items = sorted(items, key=lambda x: x.id)
+    start = 0 if after_id is None else bisect_right(items, after_id, key=lambda x: x.id)
+    return items[start:] if limit is None else items[start : start + limit]
+
+
+@dataclass
+class BulkResult(Generic[T]):
+    added: List[T] = field(default_factory=list)
+    errors: List[Tuple[int, str]] = field(default_factory=list)
 
 
 class JsonRepository:
-    def __init__(self, flowers_path: Path, invoices_path: Path) -> None:
+    def __init__(self, flowers_path: Path, invoices_path: Path, serializer: Optional[Serializer] = None) -> None:
         self.flowers_path = flowers_path
         self.invoices_path = invoices_path
+        self.serializer = serializer or SERIALIZERS["json"]
         self.flowers_path.parent.mkdir(parents=True, exist_ok=True)
         self.invoices_path.parent.mkdir(parents=True, exist_ok=True)
+        self._version = 0
+        self._version_stamp: Optional[object] = None
+        self._version_lock = threading.Lock()
 
-    def _read_json_list(self, path: Path) -> list:
-        if not path.exists():
-            return []
-        text = path.read_text(encoding="utf-8").strip()
-        if not text:
-            return []
-        return json.loads(text)
+    def _flowers_source_stamp(self) -> object:
+        return _file_stamp(self.flowers_path)
+
+    def _invoices_source_stamp(self) -> object:
+        return _file_stamp(self.invoices_path)
+
+    @property
+    def version(self) -> int:
+        stamp = (self._flowers_source_stamp(), self._invoices_source_stamp())
+        with self._version_lock:
+            if stamp != self._version_stamp:
+                self._version_stamp = stamp
+                self._version += 1
+            return self._version
+
+    def _bump_version(self) -> None:
+        # our own writes: an atomic replace can reuse the inode and keep size and
+        # mtime, so the stamp check in version is only for other processes
+        stamp = (self._flowers_source_stamp(), self._invoices_source_stamp())
+        with self._version_lock:
+            self._version_stamp = stamp
+            self._version += 1
 
-    def _write_json_list(self, path: Path, items: list) -> None:
-        path.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+    def preload(self) -> None:
+        # nothing is kept in memory: a full read warms the OS page cache and
+        # fails fast on unreadable data files
+        self.list_invoices()
+
+    def _read_records(self, path: Path) -> list:
+        return self.serializer.load(path)
+
+    def _write_records(self, path: Path, items: list) -> None:
+        self.serializer.dump(path, items)
 
     # ---------------- Flowers ----------------
 
     def list_flowers(self) -> List[Fleur]:
-        data = self._read_json_list(self.flowers_path)
-        return [fleur_from_dict(x) for x in data]
+        return load_flowers(self.flowers_path)
+
+    def iter_flowers(self) -> Iterator[Fleur]:
+        # parses the whole file up front: not memory-bounded on this backend
+        yield from load_flowers(self.flowers_path)
+
+    def page_flowers(self, limit: Optional[int] = None, after_id: Optional[str] = None) -> List[Fleur]:
+        return _keyset_page(self.list_flowers(), limit, after_id)
 
     def get_flower(self, flower_id: str) -> Optional[Fleur]:
         for f in self.list_flowers():
@@ -45,18 +141,64 @@ class JsonRepository:
                 return f
         return None
 
+    def get_flowers(self, flower_ids: Iterable[str]) -> Dict[str, Fleur]:
+        wanted = set(flower_ids)
+        return {
+            x["id"]: fleur_from_dict(x, trusted=True)
+            for x in self._read_records(self.flowers_path)
+            if x["id"] in wanted
+        }
+
     def add_flower(self, flower: Fleur) -> Fleur:
-        flowers = self._read_json_list(self.flowers_path)
-        if any(x["id"] == flower.id for x in flowers):
-            raise ValueError("flower id already exists")
-        flowers.append(fleur_to_dict(flower))
-        self._write_json_list(self.flowers_path, flowers)
-        return flower
+        with file_lock(self.flowers_path):
+            flowers = self._read_records(self.flowers_path)
+            if any(x["id"] == flower.id for x in flowers):
+                raise ValueError("flower id already exists")
+            flowers.append(fleur_to_dict(flower))
+            self._write_records(self.flowers_path, flowers)
+            self._bump_version()
+            return flower
+
+    def add_flowers(self, flowers: Iterable[Fleur]) -> BulkResult[Fleur]:
+        with file_lock(self.flowers_path):
+            data = self._read_records(self.flowers_path)
+            seen = {x["id"] for x in data}
+            result: BulkResult[Fleur] = BulkResult()
+            for index, flower in enumerate(flowers):
+                if flower.id in seen:
+                    result.errors.append((index, "flower id already exists"))
+                    continue
+                seen.add(flower.id)
+                data.append(fleur_to_dict(flower))
+                result.added.append(flower)
+            if result.added:
+                self._write_records(self.flowers_path, data)
+                self._bump_version()
+            return result
 
     def delete_flower(self, flower_id: str) -> None:
-        flowers = self._read_json_list(self.flowers_path)
-        new_flowers = [x for x in flowers if x["id"] != flower_id]
-        self._write_json_list(self.flowers_path, new_flowers)
+        with file_lock(self.flowers_path), file_lock(self.invoices_path):
+            flowers = self._read_records(self.flowers_path)
+            for x in flowers:
+                if x["id"] == flower_id:
+                    self._inline_sold_flower(x)
+            new_flowers = [x for x in flowers if x["id"] != flower_id]
+            self._write_records(self.flowers_path, new_flowers)
+            self._bump_version()
+
+    def _inline_sold_flower(self, record: dict) -> None:
+        # invoices only reference catalogue flowers by id; copy the flower into
+        # them before it leaves the catalogue
+        invoices = self._read_records(self.invoices_path)
+        changed = False
+        for inv in invoices:
+            for i, line in enumerate(inv["bouquet"]):
+                if line["id"] == record["id"] and "espece" not in line:
+                    inv["bouquet"][i] = {**record, "prix": line["prix"]}
+                    changed = True
+        if changed:
+            self._write_records(self.invoices_path, invoices)
+            self._bump_version()
 
     def search_flowers_price_between(self, prix_min: float, prix_max: float) -> List[Fleur]:
         if prix_min > prix_max:
@@ -67,11 +209,53 @@ class JsonRepository:
         d = _parse_date(cut_date)
         return [f for f in self.list_flowers() if f.date_coupe == d]
 
+    def search_flowers_by_cut_date_between(self, debut: str | date, fin: str | date) -> List[Fleur]:
+        debut, fin = _parse_date(debut), _parse_date(fin)
+        if debut > fin:
+            raise ValueError("debut must be <= fin")
+        return [f for f in self.list_flowers() if debut <= f.date_coupe <= fin]
+
+    def search_flowers(
+        self,
+        espece: Optional[str] = None,
+        qualite: Optional[str] = None,
+        prix_min: Optional[float] = None,
+        prix_max: Optional[float] = None,
+        debut: Optional[str | date] = None,
+        fin: Optional[str | date] = None,
+    ) -> List[Fleur]:
+        # espece / qualite match case-insensitively on word prefixes (see indexes.text_matches)
+        debut, fin = _check_search_bounds(prix_min, prix_max, debut, fin)
+        for query in (espece, qualite):
+            if query is not None:
+                query_terms(query)
+        return [
+            f
+            for f in self.list_flowers()
+            if (espece is None or text_matches(f.espece, espece))
+            and (qualite is None or text_matches(f.qualite, qualite))
+            and _in_bounds(f, prix_min, prix_max, debut, fin)
+        ]
+
     # ---------------- Invoices ----------------
 
+    def _flower_identity_map(self) -> Dict[str, Fleur]:
+        return {f.id: f for f in self.list_flowers()}
+
+    def _read_invoices(self) -> Iterator[Facture]:
+        yield from load_invoices(self.invoices_path, self._flower_identity_map)
+
     def list_invoices(self) -> List[Facture]:
-        data = self._read_json_list(self.invoices_path)
-        return [Facture.from_dict(x) for x in data]
+        return list(self._read_invoices())
+
+    def iter_invoices(self) -> Iterator[Facture]:
+        return self._read_invoices()
+
+    def page_invoices(
+        self, limit: Optional[int] = None, after_id: Optional[str] = None, client: Optional[str] = None
+    ) -> List[Facture]:
+        invoices = self.invoices_by_client(client) if client else self.list_invoices()
+        return _keyset_page(invoices, limit, after_id)
 
     def get_invoice(self, invoice_id: str) -> Optional[Facture]:
         for inv in self.list_invoices():
@@ -79,24 +263,678 @@ class JsonRepository:
                 return inv
         return None
 
+    def _build_invoice(self, client: str, date_vente: date, bouquet_ids: List[str]) -> Facture:
+        flowers = self.get_flowers(bouquet_ids)
+        if any(fid not in flowers for fid in bouquet_ids):
+            raise ValueError("unknown flower id in bouquet")
+        return Facture(client=client, date_vente=date_vente, bouquet=[flowers[fid] for fid in bouquet_ids])
+
+    def create_invoice(self, client: str, date_vente: date, bouquet_ids: List[str]) -> Facture:
+        with file_lock(self.invoices_path):
+            invoice = self._build_invoice(client, date_vente, bouquet_ids)
+            invoices = self._read_records(self.invoices_path)
+            invoices.append(invoice.to_dict(set(bouquet_ids)))
+            self._write_records(self.invoices_path, invoices)
+            self._bump_version()
+            return invoice
+
     def add_invoice(self, invoice: Facture) -> Facture:
-        known_flowers = {f.id for f in self.list_flowers()}
-        for f in invoice.bouquet:
-            if f.id not in known_flowers:
-                raise ValueError("invoice contains unknown flower")
+        with file_lock(self.invoices_path):
+            known_flowers = {x["id"] for x in self._read_records(self.flowers_path)}
+            for f in invoice.bouquet:
+                if f.id not in known_flowers:
+                    raise ValueError("invoice contains unknown flower")
+
+            invoices = self._read_records(self.invoices_path)
+            if any(x["id"] == invoice.id for x in invoices):
+                raise ValueError("invoice id already exists")
 
-        invoices = self._read_json_list(self.invoices_path)
-        if any(x["id"] == invoice.id for x in invoices):
-            raise ValueError("invoice id already exists")
+            invoices.append(invoice.to_dict(known_flowers))
+            self._write_records(self.invoices_path, invoices)
+            self._bump_version()
+            return invoice
 
-        invoices.append(invoice.to_dict())
-        self._write_json_list(self.invoices_path, invoices)
-        return invoice
+    def add_invoices(self, invoices: Iterable[Facture]) -> BulkResult[Facture]:
+        with file_lock(self.invoices_path):
+            known_flowers = {x["id"] for x in self._read_records(self.flowers_path)}
+            data = self._read_records(self.invoices_path)
+            seen = {x["id"] for x in data}
+            result: BulkResult[Facture] = BulkResult()
+            for index, invoice in enumerate(invoices):
+                if any(f.id not in known_flowers for f in invoice.bouquet):
+                    result.errors.append((index, "invoice contains unknown flower"))
+                    continue
+                if invoice.id in seen:
+                    result.errors.append((index, "invoice id already exists"))
+                    continue
+                seen.add(invoice.id)
+                data.append(invoice.to_dict(known_flowers))
+                result.added.append(invoice)
+            if result.added:
+                self._write_records(self.invoices_path, data)
+                self._bump_version()
+            return result
 
     def delete_invoice(self, invoice_id: str) -> None:
-        invoices = self._read_json_list(self.invoices_path)
-        new_invoices = [x for x in invoices if x["id"] != invoice_id]
-        self._write_json_list(self.invoices_path, new_invoices)
+        with file_lock(self.invoices_path):
+            invoices = self._read_records(self.invoices_path)
+            new_invoices = [x for x in invoices if x["id"] != invoice_id]
+            self._write_records(self.invoices_path, new_invoices)
+            self._bump_version()
 
     def invoices_by_client(self, client: str) -> List[Facture]:
         return [inv for inv in self.list_invoices() if inv.client == client]
+
+    def invoices_between(
+        self, debut: str | date, fin: str | date, client: Optional[str] = None
+    ) -> List[Facture]:
+        debut, fin = _parse_date(debut), _parse_date(fin)
+        if debut > fin:
+            raise ValueError("debut must be <= fin")
+        return [
+            inv
+            for inv in self.list_invoices()
+            if (client is None or inv.client == client) and debut <= inv.date_vente <= fin
+        ]
+
+    def loyalty_summaries(self) -> List[LoyaltySummary]:
+        summaries: Dict[str, LoyaltySummary] = {}
+        for inv in self.iter_invoices():
+            summaries.setdefault(inv.client, LoyaltySummary(inv.client)).add(inv)
+        return sorted(summaries.values(), key=lambda x: x.client)
+
+    def loyalty_summary(self, client: str) -> Optional[LoyaltySummary]:
+        summary = LoyaltySummary(client)
+        for inv in self.invoices_by_client(client):
+            summary.add(inv)
+        return summary if summary.invoice_count else None
+
+    def sales_report(
+        self, group_by: str, debut: Optional[str | date] = None, fin: Optional[str | date] = None
+    ) -> List[SalesRow]:
+        debut, fin = _check_search_bounds(None, None, debut, fin)
+        return SalesRollup(self.iter_invoices()).report(group_by, debut, fin)
+
+
+def _journal_path(path: Path) -> Path:
+    return path.with_name(path.name + ".journal")
+
+
+def _file_stamp(path: Path) -> Tuple[int, int, int]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return (0, 0, 0)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+# search_flowers scans the catalogue instead of an index when the best index
+# still matches more than 1 / _SCAN_FRACTION of the flowers
+_SCAN_FRACTION = 4
+
+
+class CachedJsonRepository(JsonRepository):
+    def __init__(self, flowers_path: Path, invoices_path: Path, serializer: Optional[Serializer] = None) -> None:
+        super().__init__(flowers_path, invoices_path, serializer)
+        self._flowers: Dict[str, Fleur] = {}
+        self._invoices: Dict[str, Facture] = {}
+        self._flowers_stamp: Optional[object] = None
+        self._invoices_stamp: Optional[object] = None
+        self._flower_order = SortedIndex()
+        self._invoice_order = SortedIndex()
+        self._sale_date_index = SortedIndex()
+        self._client_sale_dates: Dict[str, SortedIndex] = {}
+        self._flower_invoices: Dict[str, Set[str]] = {}
+        self._loyalty: Dict[str, LoyaltySummary] = {}
+        self._price_index = SortedIndex()
+        self._cut_date_index = SortedIndex()
+        self._espece_index = InvertedIndex()
+        self._qualite_index = InvertedIndex()
+        self._catalogue = FlowerCatalogue()
+        self._sales = SalesRollup()
+        self._lock = threading.RLock()
+
+    @_locked
+    def preload(self) -> None:
+        self._flower_map()
+        self._invoice_map()
+
+    def read_nowait(self, fn: Callable[..., T], *args: Any) -> Tuple[bool, Optional[T]]:
+        # runs fn under the lock only if that needs neither waiting for a writer
+        # nor reloading from disk (a stat per data file); (False, None) otherwise
+        if not self._lock.acquire(blocking=False):
+            return False, None
+        try:
+            if self._flowers_stamp != self._flowers_source_stamp():
+                return False, None
+            if self._invoices_stamp != self._invoices_source_stamp():
+                return False, None
+            return True, fn(*args)
+        finally:
+            self._lock.release()
+
+    def _load_flower_map(self) -> Dict[str, Fleur]:
+        return {f.id: f for f in JsonRepository.list_flowers(self)}
+
+    def _flower_identity_map(self) -> Dict[str, Fleur]:
+        return dict(self._flower_map())
+
+    def _load_invoice_map(self) -> Dict[str, Facture]:
+        return {inv.id: inv for inv in self._read_invoices()}
+
+    @_locked
+    def _flower_map(self) -> Dict[str, Fleur]:
+        stamp = self._flowers_source_stamp()
+        if stamp != self._flowers_stamp:
+            # optimistic read: retry if a writer replaced the files while we were loading
+            while True:
+                self._flowers = self._load_flower_map()
+                current = self._flowers_source_stamp()
+                if current == stamp:
+                    break
+                stamp = current
+            self._flowers_stamp = stamp
+            self._reindex_flowers()
+        return self._flowers
+
+    @_locked
+    def _invoice_map(self) -> Dict[str, Facture]:
+        stamp = self._invoices_source_stamp()
+        if stamp != self._invoices_stamp:
+            while True:
+                self._invoices = self._load_invoice_map()
+                current = self._invoices_source_stamp()
+                if current == stamp:
+                    break
+                stamp = current
+            self._invoices_stamp = stamp
+            self._reindex_invoices()
+        return self._invoices
+
+    def _reindex_flowers(self) -> None:
+        flowers = self._flowers.values()
+        self._flower_order = SortedIndex((f.id, f.id) for f in flowers)
+        self._price_index = SortedIndex((_to_cents(f.prix), f.id) for f in flowers)
+        self._cut_date_index = SortedIndex((f.date_coupe.toordinal(), f.id) for f in flowers)
+        self._espece_index = InvertedIndex((f.espece, f.id) for f in flowers)
+        self._qualite_index = InvertedIndex((f.qualite, f.id) for f in flowers)
+        self._catalogue = FlowerCatalogue(flowers)
+
+    def _index_flower(self, flower: Fleur) -> None:
+        self._flower_order.add(flower.id, flower.id)
+        self._price_index.add(_to_cents(flower.prix), flower.id)
+        self._cut_date_index.add(flower.date_coupe.toordinal(), flower.id)
+        self._espece_index.add(flower.espece, flower.id)
+        self._qualite_index.add(flower.qualite, flower.id)
+        self._catalogue.add(flower)
+
+    def _unindex_flower(self, flower: Fleur) -> None:
+        self._flower_order.remove(flower.id, flower.id)
+        self._price_index.remove(_to_cents(flower.prix), flower.id)
+        self._cut_date_index.remove(flower.date_coupe.toordinal(), flower.id)
+        self._espece_index.remove(flower.espece, flower.id)
+        self._qualite_index.remove(flower.qualite, flower.id)
+        self._catalogue.remove(flower.id)
+
+    def _reindex_invoices(self) -> None:
+        self._invoice_order = SortedIndex((i, i) for i in self._invoices)
+        self._sale_date_index = SortedIndex((inv.date_vente.toordinal(), inv.id) for inv in self._invoices.values())
+        self._client_sale_dates = {}
+        self._flower_invoices = {}
+        self._loyalty = {}
+        for invoice in self._invoices.values():
+            self._client_sale_dates.setdefault(invoice.client, SortedIndex()).add(
+                invoice.date_vente.toordinal(), invoice.id
+            )
+            for f in invoice.bouquet:
+                self._flower_invoices.setdefault(f.id, set()).add(invoice.id)
+            self._loyalty.setdefault(invoice.client, LoyaltySummary(invoice.client)).add(invoice)
+        self._sales.rebuild(self._invoices.values())
+
+    def _index_invoice(self, invoice: Facture) -> None:
+        self._invoice_order.add(invoice.id, invoice.id)
+        day = invoice.date_vente.toordinal()
+        self._sale_date_index.add(day, invoice.id)
+        self._client_sale_dates.setdefault(invoice.client, SortedIndex()).add(day, invoice.id)
+        for f in invoice.bouquet:
+            self._flower_invoices.setdefault(f.id, set()).add(invoice.id)
+        self._loyalty.setdefault(invoice.client, LoyaltySummary(invoice.client)).add(invoice)
+        self._sales.add(invoice)
+
+    def _unindex_invoice(self, invoice: Facture) -> None:
+        self._invoice_order.remove(invoice.id, invoice.id)
+        day = invoice.date_vente.toordinal()
+        self._sale_date_index.remove(day, invoice.id)
+        sale_dates = self._client_sale_dates[invoice.client]
+        sale_dates.remove(day, invoice.id)
+        if not len(sale_dates):
+            del self._client_sale_dates[invoice.client]
+        for f in invoice.bouquet:
+            sold_in = self._flower_invoices.get(f.id)
+            if sold_in is not None:
+                sold_in.discard(invoice.id)
+                if not sold_in:
+                    del self._flower_invoices[f.id]
+        summary = self._loyalty[invoice.client]
+        summary.remove(invoice)
+        if not summary.invoice_count:
+            del self._loyalty[invoice.client]
+        self._sales.remove(invoice)
+
+    def _save_flowers(self) -> None:
+        try:
+            self._write_records(self.flowers_path, [fleur_to_dict(f) for f in self._flowers.values()])
+        except OSError:
+            self._flowers_stamp = None
+            raise
+        self._flowers_stamp = self._flowers_source_stamp()
+
+    def _save_invoices(self) -> None:
+        try:
+            self._write_records(
+                self.invoices_path, [inv.to_dict(self._flowers) for inv in self._invoices.values()]
+            )
+        except OSError:
+            self._invoices_stamp = None
+            raise
+        self._invoices_stamp = self._invoices_source_stamp()
+
+    def _flowers_changed(self, flower_ids: List[str]) -> None:
+        self._save_flowers()
+        self._bump_version()
+
+    def _invoices_changed(self, invoice_ids: List[str]) -> None:
+        self._save_invoices()
+        self._bump_version()
+
+    # ---------------- Flowers ----------------
+
+    @_locked
+    def list_flowers(self) -> List[Fleur]:
+        return list(self._flower_map().values())
+
+    def iter_flowers(self, batch_size: int = 1000) -> Iterator[Fleur]:
+        # a page at a time under the lock, in id order: nothing is copied
+        # beyond the current page
+        after_id = None
+        while True:
+            page = self.page_flowers(batch_size, after_id)
+            yield from page
+            if len(page) < batch_size:
+                return
+            after_id = page[-1].id
+
+    @_locked
+    def page_flowers(self, limit: Optional[int] = None, after_id: Optional[str] = None) -> List[Fleur]:
+        flowers = self._flower_map()
+        return [flowers[i] for i in self._flower_order.after(after_id, limit)]
+
+    @_locked
+    def get_flower(self, flower_id: str) -> Optional[Fleur]:
+        return self._flower_map().get(flower_id)
+
+    @_locked
+    def get_flowers(self, flower_ids: Iterable[str]) -> Dict[str, Fleur]:
+        flowers = self._flower_map()
+        return {fid: flowers[fid] for fid in flower_ids if fid in flowers}
+
+    @_locked
+    def add_flower(self, flower: Fleur) -> Fleur:
+        with file_lock(self.flowers_path):
+            flowers = self._flower_map()
+            if flower.id in flowers:
+                raise ValueError("flower id already exists")
+            flowers[flower.id] = flower
+            self._index_flower(flower)
+            self._flowers_changed([flower.id])
+            return flower
+
+    @_locked
+    def add_flowers(self, flowers: Iterable[Fleur]) -> BulkResult[Fleur]:
+        with file_lock(self.flowers_path):
+            known = self._flower_map()
+            result: BulkResult[Fleur] = BulkResult()
+            for index, flower in enumerate(flowers):
+                if flower.id in known:
+                    result.errors.append((index, "flower id already exists"))
+                    continue
+                known[flower.id] = flower
+                self._index_flower(flower)
+                result.added.append(flower)
+            if result.added:
+                self._flowers_changed([f.id for f in result.added])
+            return result
+
+    @_locked
+    def delete_flower(self, flower_id: str) -> None:
+        with file_lock(self.flowers_path), file_lock(self.invoices_path):
+            flowers = self._flower_map()
+            self._invoice_map()
+            removed = flowers.pop(flower_id, None)
+            if removed is not None:
+                self._unindex_flower(removed)
+                sold_in = list(self._flower_invoices.get(flower_id, ()))
+                if sold_in:
+                    self._invoices_changed(sold_in)
+                self._flowers_changed([flower_id])
+
+    @_locked
+    def search_flowers_price_between(self, prix_min: float, prix_max: float) -> List[Fleur]:
+        if prix_min > prix_max:
+            raise ValueError("prix_min must be <= prix_max")
+        flowers = self._flower_map()
+        lo = math.ceil(round(prix_min * 100, 6))
+        hi = math.floor(round(prix_max * 100, 6))
+        return [flowers[i] for i in self._price_index.range(lo, hi)]
+
+    @_locked
+    def search_flowers_by_cut_date(self, cut_date: str | date) -> List[Fleur]:
+        d = _parse_date(cut_date).toordinal()
+        flowers = self._flower_map()
+        return [flowers[i] for i in self._cut_date_index.range(d, d)]
+
+    @_locked
+    def search_flowers_by_cut_date_between(self, debut: str | date, fin: str | date) -> List[Fleur]:
+        debut, fin = _parse_date(debut), _parse_date(fin)
+        if debut > fin:
+            raise ValueError("debut must be <= fin")
+        flowers = self._flower_map()
+        return [flowers[i] for i in self._cut_date_index.range(debut.toordinal(), fin.toordinal())]
+
+    @_locked
+    def search_flowers(
+        self,
+        espece: Optional[str] = None,
+        qualite: Optional[str] = None,
+        prix_min: Optional[float] = None,
+        prix_max: Optional[float] = None,
+        debut: Optional[str | date] = None,
+        fin: Optional[str | date] = None,
+    ) -> List[Fleur]:
+        debut, fin = _check_search_bounds(prix_min, prix_max, debut, fin)
+        flowers = self._flower_map()
+        texts = [
+            index.search(query)
+            for index, query in ((self._espece_index, espece), (self._qualite_index, qualite))
+            if query is not None
+        ]
+        ranges = []
+        if prix_min is not None or prix_max is not None:
+            lo = -math.inf if prix_min is None else math.ceil(round(prix_min * 100, 6))
+            hi = math.inf if prix_max is None else math.floor(round(prix_max * 100, 6))
+            ranges.append((self._price_index, lo, hi))
+        if debut is not None or fin is not None:
+            lo = -math.inf if debut is None else debut.toordinal()
+            hi = math.inf if fin is None else fin.toordinal()
+            ranges.append((self._cut_date_index, lo, hi))
+
+        # drive from the most selective index and check the other filters per
+        # flower; when nothing narrows it down, scan the columnar catalogue
+        texts.sort(key=len)
+        sizes = [(len(ids), i) for i, ids in enumerate(texts)]
+        sizes += [(index.count_range(lo, hi), len(texts) + i) for i, (index, lo, hi) in enumerate(ranges)]
+        if not sizes:
+            return list(flowers.values())
+        size, best = min(sizes)
+        if size * _SCAN_FRACTION > len(flowers):
+            ids = self._catalogue.filter(prix_min, prix_max, debut, fin)
+            return [flowers[i] for i in ids if all(i in t for t in texts)]
+        if best < len(texts):
+            candidates = sorted(texts.pop(best))
+        else:
+            index, lo, hi = ranges[best - len(texts)]
+            candidates = index.range(lo, hi)
+        return [
+            f
+            for f in (flowers[i] for i in candidates)
+            if all(f.id in t for t in texts) and _in_bounds(f, prix_min, prix_max, debut, fin)
+        ]
+
+    # ---------------- Invoices ----------------
+
+    @_locked
+    def list_invoices(self) -> List[Facture]:
+        return list(self._invoice_map().values())
+
+    def iter_invoices(self, batch_size: int = 1000) -> Iterator[Facture]:
+        after_id = None
+        while True:
+            page = self.page_invoices(batch_size, after_id)
+            yield from page
+            if len(page) < batch_size:
+                return
+            after_id = page[-1].id
+
+    @_locked
+    def page_invoices(
+        self, limit: Optional[int] = None, after_id: Optional[str] = None, client: Optional[str] = None
+    ) -> List[Facture]:
+        if client:
+            return super().page_invoices(limit, after_id, client)
+        invoices = self._invoice_map()
+        return [invoices[i] for i in self._invoice_order.after(after_id, limit)]
+
+    @_locked
+    def get_invoice(self, invoice_id: str) -> Optional[Facture]:
+        return self._invoice_map().get(invoice_id)
+
+    @_locked
+    def create_invoice(self, client: str, date_vente: date, bouquet_ids: List[str]) -> Facture:
+        with file_lock(self.invoices_path):
+            invoice = self._build_invoice(client, date_vente, bouquet_ids)
+            self._invoice_map()[invoice.id] = invoice
+            self._index_invoice(invoice)
+            self._invoices_changed([invoice.id])
+            return invoice
+
+    @_locked
+    def add_invoice(self, invoice: Facture) -> Facture:
+        with file_lock(self.invoices_path):
+            known_flowers = self._flower_map()
+            for f in invoice.bouquet:
+                if f.id not in known_flowers:
+                    raise ValueError("invoice contains unknown flower")
+
+            invoices = self._invoice_map()
+            if invoice.id in invoices:
+                raise ValueError("invoice id already exists")
+
+            invoices[invoice.id] = invoice
+            self._index_invoice(invoice)
+            self._invoices_changed([invoice.id])
+            return invoice
+
+    @_locked
+    def add_invoices(self, invoices: Iterable[Facture]) -> BulkResult[Facture]:
+        with file_lock(self.invoices_path):
+            known_flowers = self._flower_map()
+            known = self._invoice_map()
+            result: BulkResult[Facture] = BulkResult()
+            for index, invoice in enumerate(invoices):
+                if any(f.id not in known_flowers for f in invoice.bouquet):
+                    result.errors.append((index, "invoice contains unknown flower"))
+                    continue
+                if invoice.id in known:
+                    result.errors.append((index, "invoice id already exists"))
+                    continue
+                known[invoice.id] = invoice
+                self._index_invoice(invoice)
+                result.added.append(invoice)
+            if result.added:
+                self._invoices_changed([inv.id for inv in result.added])
+            return result
+
+    @_locked
+    def delete_invoice(self, invoice_id: str) -> None:
+        with file_lock(self.invoices_path):
+            invoices = self._invoice_map()
+            removed = invoices.pop(invoice_id, None)
+            if removed is not None:
+                self._unindex_invoice(removed)
+                self._invoices_changed([invoice_id])
+
+    @_locked
+    def invoices_by_client(self, client: str) -> List[Facture]:
+        return self.invoices_between(date.min, date.max, client)
+
+    @_locked
+    def invoices_between(
+        self, debut: str | date, fin: str | date, client: Optional[str] = None
+    ) -> List[Facture]:
+        debut, fin = _parse_date(debut), _parse_date(fin)
+        if debut > fin:
+            raise ValueError("debut must be <= fin")
+        invoices = self._invoice_map()
+        index = self._sale_date_index if client is None else self._client_sale_dates.get(client)
+        if index is None:
+            return []
+        return [invoices[i] for i in index.range(debut.toordinal(), fin.toordinal())]
+
+    @_locked
+    def loyalty_summaries(self) -> List[LoyaltySummary]:
+        self._invoice_map()
+        return [replace(x) for x in sorted(self._loyalty.values(), key=lambda x: x.client)]
+
+    @_locked
+    def loyalty_summary(self, client: str) -> Optional[LoyaltySummary]:
+        self._invoice_map()
+        summary = self._loyalty.get(client)
+        return None if summary is None else replace(summary)
+
+    @_locked
+    def sales_report(
+        self, group_by: str, debut: Optional[str | date] = None, fin: Optional[str | date] = None
+    ) -> List[SalesRow]:
+        debut, fin = _check_search_bounds(None, None, debut, fin)
+        self._invoice_map()
+        return self._sales.report(group_by, debut, fin)
+
+
+class JournalRepository(CachedJsonRepository):
+    def __init__(
+        self,
+        flowers_path: Path,
+        invoices_path: Path,
+        compact_after: int = 1000,
+        compact_bytes: int = 4 * 1024 * 1024,
+        serializer: Optional[Serializer] = None,
+    ) -> None:
+        super().__init__(flowers_path, invoices_path, serializer)
+        self.flowers_journal = _journal_path(flowers_path)
+        self.invoices_journal = _journal_path(invoices_path)
+        self.compact_after = compact_after
+        self.compact_bytes = compact_bytes
+        self._journal_records: Dict[Path, int] = {self.flowers_journal: 0, self.invoices_journal: 0}
+
+    def _flowers_source_stamp(self) -> object:
+        return (_file_stamp(self.flowers_path), _file_stamp(self.flowers_journal))
+
+    def _invoices_source_stamp(self) -> object:
+        return (_file_stamp(self.invoices_path), _file_stamp(self.invoices_journal))
+
+    def _load_flower_map(self) -> Dict[str, Fleur]:
+        records = self._replay(self.flowers_path, self.flowers_journal)
+        return {fid: fleur_from_dict(x, trusted=True) for fid, x in records.items()}
+
+    def _load_invoice_map(self) -> Dict[str, Facture]:
+        records = self._replay(self.invoices_path, self.invoices_journal)
+        interned = self._flower_identity_map() if records else {}
+        return {iid: Facture.from_dict(x, interned, trusted=True) for iid, x in records.items()}
+
+    def _replay(self, snapshot: Path, journal: Path) -> Dict[str, dict]:
+        records = {x["id"]: x for x in self._read_records(snapshot)}
+        count = 0
+        if journal.exists():
+            STORAGE_READS.labels(journal.name).inc()
+            STORAGE_READ_BYTES.labels(journal.name).inc(_file_stamp(journal)[2])
+            with journal.open(encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # torn write from a crash: the record never completed
+                        continue
+                    if record["op"] == "put":
+                        records[record["item"]["id"]] = record["item"]
+                    else:
+                        records.pop(record["id"], None)
+                    count += 1
+        self._journal_records[journal] = count
+        return records
+
+    def _append(self, journal: Path, records: List[dict]) -> None:
+        lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with journal.open("a+b") as fh:
+            if fh.tell() > 0:
+                fh.seek(-1, os.SEEK_END)
+                if fh.read(1) != b"\n":
+                    lines = "\n" + lines
+            data = lines.encode("utf-8")
+            fh.write(data)
+        STORAGE_WRITES.labels(journal.name).inc()
+        STORAGE_WRITE_BYTES.labels(journal.name).inc(len(data))
+        self._journal_records[journal] += len(records)
+
+    def _needs_compaction(self, journal: Path) -> bool:
+        if self._journal_records[journal] >= self.compact_after:
+            return True
+        return _file_stamp(journal)[2] >= self.compact_bytes
+
+    def _flowers_changed(self, flower_ids: List[str]) -> None:
+        records = []
+        for flower_id in flower_ids:
+            flower = self._flowers.get(flower_id)
+            if flower is None:
+                records.append({"op": "delete", "id": flower_id})
+            else:
+                records.append({"op": "put", "item": fleur_to_dict(flower)})
+        try:
+            self._append(self.flowers_journal, records)
+        except OSError:
+            self._flowers_stamp = None
+            raise
+        if self._needs_compaction(self.flowers_journal):
+            self._compact_flowers()
+        else:
+            self._flowers_stamp = self._flowers_source_stamp()
+        self._bump_version()
+
+    def _invoices_changed(self, invoice_ids: List[str]) -> None:
+        records = []
+        for invoice_id in invoice_ids:
+            invoice = self._invoices.get(invoice_id)
+            if invoice is None:
+                records.append({"op": "delete", "id": invoice_id})
+            else:
+                records.append({"op": "put", "item": invoice.to_dict(self._flowers)})
+        try:
+            self._append(self.invoices_journal, records)
+        except OSError:
+            self._invoices_stamp = None
+            raise
+        if self._needs_compaction(self.invoices_journal):
+            self._compact_invoices()
+        else:
+            self._invoices_stamp = self._invoices_source_stamp()
+        self._bump_version()
+
+    def _compact_flowers(self) -> None:
+        self._save_flowers()
+        self.flowers_journal.unlink(missing_ok=True)
+        self._journal_records[self.flowers_journal] = 0
+        self._flowers_stamp = self._flowers_source_stamp()
+
+    def _compact_invoices(self) -> None:
+        self._save_invoices()
+        self.invoices_journal.unlink(missing_ok=True)
+        self._journal_records[self.invoices_journal] = 0
+        self._invoices_stamp = self._invoices_source_stamp()
+
+    @_locked
+    def compact(self) -> None:
+        with file_lock(self.flowers_path):
+            self._flower_map()
+            self._compact_flowers()
+        with file_lock(self.invoices_path):
+            self._invoice_map()
+            self._compact_invoices()
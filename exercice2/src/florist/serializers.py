@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import json
+import marshal
+import sys
+from abc import ABC, abstractmethod
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .locking import atomic_write_bytes
+from .metrics import (
+    STORAGE_DECODE,
+    STORAGE_ENCODE,
+    STORAGE_PARSE,
+    STORAGE_READ_BYTES,
+    STORAGE_READS,
+    STORAGE_WRITE_BYTES,
+    STORAGE_WRITES,
+)
+from .models import Facture, Fleur, _bouquet_line_from_dict, _bouquet_ref, _parse_date, fleur_from_dict
+
+# Records are the plain dicts the repositories store (fleur_to_dict /
+# Facture.to_dict); dates may be ISO strings or date objects.
+
+SNAPSHOT_MAGIC = b"FLORIST-SNAPSHOT\x02"
+_LEGACY_SNAPSHOT_MAGIC = b"FLORIST-SNAPSHOT\x01"
+_MARSHAL_VERSION = 4
+# marshal data is only guaranteed to load on the interpreter version that
+# wrote it: snapshots record it after the magic and refuse to load elsewhere
+SNAPSHOT_WRITER = f"{sys.implementation.name}-{sys.version_info[0]}.{sys.version_info[1]}-marshal{_MARSHAL_VERSION}"
+
+
+def _json_default(value: object) -> str:
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _day(value: str | date) -> int:
+    return _parse_date(value).toordinal()
+
+
+def _flower_row(x: dict) -> tuple:
+    return (x["id"], x["espece"], _day(x["date_coupe"]), x["qualite"], float(x["prix"]))
+
+
+def _flower_record(row: tuple) -> dict:
+    return {"id": row[0], "espece": row[1], "date_coupe": date.fromordinal(row[2]), "qualite": row[3], "prix": row[4]}
+
+
+def _invoice_row(x: dict) -> tuple:
+    lines = tuple(_flower_row(line) if "espece" in line else (line["id"], float(line["prix"])) for line in x["bouquet"])
+    return (x["id"], x["client"], _day(x["date_vente"]), x.get("prix_vente"), lines)
+
+
+def _invoice_record(row: tuple) -> dict:
+    return {
+        "id": row[0],
+        "client": row[1],
+        "date_vente": date.fromordinal(row[2]),
+        "bouquet": [_flower_record(line) if len(line) == 5 else {"id": line[0], "prix": line[1]} for line in row[4]],
+        "prix_vente": row[3],
+    }
+
+
+def _read_bytes(path: Path) -> bytes:
+    if not path.exists():
+        return b""
+    data = path.read_bytes()
+    STORAGE_READS.labels(path.name).inc()
+    STORAGE_READ_BYTES.labels(path.name).inc(len(data))
+    return data
+
+
+# Reads sniff the format from the content, so every serializer reads every file.
+# _parse returns (snapshot kind, rows), or (None, records) for JSON.
+
+
+def _snapshot_header() -> bytes:
+    writer = SNAPSHOT_WRITER.encode("ascii")
+    return SNAPSHOT_MAGIC + bytes([len(writer)]) + writer
+
+
+def _load_snapshot(path: Path, data: bytes) -> Tuple[str, list]:
+    if data.startswith(_LEGACY_SNAPSHOT_MAGIC):
+        body = memoryview(data)[len(_LEGACY_SNAPSHOT_MAGIC) :]
+    else:
+        start = len(SNAPSHOT_MAGIC) + 1
+        end = start + data[start - 1]
+        writer = data[start:end].decode("ascii", "replace")
+        if writer != SNAPSHOT_WRITER:
+            raise ValueError(
+                f"{path} is a snapshot written by {writer}, not {SNAPSHOT_WRITER}: re-export it with"
+                " `python -m exercice2.src.florist.convert --to json` on the interpreter that wrote it"
+            )
+        body = memoryview(data)[end:]
+    try:
+        return marshal.loads(body)
+    except (EOFError, ValueError, TypeError) as e:
+        raise ValueError(f"{path} is not a readable snapshot ({e}): re-export it with convert") from None
+
+
+def _parse(path: Path) -> Tuple[Optional[str], list]:
+    data = _read_bytes(path)
+    with STORAGE_PARSE.labels(path.name).time():
+        if data.startswith(SNAPSHOT_MAGIC) or data.startswith(_LEGACY_SNAPSHOT_MAGIC):
+            return _load_snapshot(path, data)
+        text = data.decode("utf-8").strip()
+        return None, json.loads(text) if text else []
+
+
+def load_records(path: Path) -> list:
+    kind, rows = _parse(path)
+    if kind is None:
+        return rows
+    decode = _invoice_record if kind == "invoices" else _flower_record
+    with STORAGE_DECODE.labels(path.name).time():
+        return [decode(row) for row in rows]
+
+
+def load_flowers(path: Path) -> List[Fleur]:
+    kind, rows = _parse(path)
+    with STORAGE_DECODE.labels(path.name).time():
+        if kind is None:
+            return [fleur_from_dict(x, trusted=True) for x in rows]
+        days: Dict[int, date] = {}
+        out = []
+        for fid, espece, day, qualite, prix in rows:
+            d = days.get(day)
+            if d is None:
+                d = days[day] = date.fromordinal(day)
+            out.append(Fleur.from_trusted(id=fid, espece=espece, date_coupe=d, qualite=qualite, prix=prix))
+        return out
+
+
+def load_invoices(path: Path, flowers: Callable[[], Dict[str, Fleur]]) -> List[Facture]:
+    # `flowers` returns the identity map bouquet references resolve against;
+    # it is only called when there are invoices to decode
+    kind, rows = _parse(path)
+    interned = flowers() if rows else {}
+    with STORAGE_DECODE.labels(path.name).time():
+        if kind is None:
+            return [Facture.from_dict(x, interned, trusted=True) for x in rows]
+        days: Dict[int, date] = {}
+        out = []
+        for iid, client, day, prix_vente, lines in rows:
+            d = days.get(day)
+            if d is None:
+                d = days[day] = date.fromordinal(day)
+            bouquet = [
+                _bouquet_ref(interned, line[0], line[1])
+                if len(line) == 2
+                else _bouquet_line_from_dict(_flower_record(line), interned, True)
+                for line in lines
+            ]
+            out.append(
+                Facture.from_trusted(id=iid, client=client, date_vente=d, bouquet=bouquet, prix_vente=prix_vente)
+            )
+        return out
+
+
+class Serializer(ABC):
+    suffix = ".json"
+
+    def load(self, path: Path) -> list:
+        return load_records(path)
+
+    @abstractmethod
+    def encode(self, records: list) -> bytes:
+        pass
+
+    def dump(self, path: Path, records: list) -> None:
+        with STORAGE_ENCODE.labels(path.name).time():
+            data = self.encode(records)
+        atomic_write_bytes(path, data)
+        STORAGE_WRITES.labels(path.name).inc()
+        STORAGE_WRITE_BYTES.labels(path.name).inc(len(data))
+
+
+class JsonSerializer(Serializer):
+    def __init__(self, indent: Optional[int] = 2) -> None:
+        self.indent = indent
+
+    def encode(self, records: list) -> bytes:
+        separators = None if self.indent else (",", ":")
+        text = json.dumps(records, ensure_ascii=False, indent=self.indent, separators=separators, default=_json_default)
+        return text.encode("utf-8")
+
+
+class SnapshotSerializer(Serializer):
+    # marshal of plain tuples with day ordinals: no JSON parsing and no date
+    # string parsing on load. A snapshot only loads on the interpreter version
+    # that wrote it (SNAPSHOT_WRITER), so keep JSON for anything meant to be
+    # exchanged or kept across upgrades.
+    suffix = ".snap"
+
+    def encode(self, records: list) -> bytes:
+        if any("bouquet" in x for x in records):
+            payload = ("invoices", [_invoice_row(x) for x in records])
+        else:
+            payload = ("flowers", [_flower_row(x) for x in records])
+        return _snapshot_header() + marshal.dumps(payload, _MARSHAL_VERSION)
+
+
+SERIALIZERS: Dict[str, Serializer] = {
+    "json": JsonSerializer(),
+    "compact": JsonSerializer(indent=None),
+    "snapshot": SnapshotSerializer(),
+}
+
+
+def data_paths(data_dir: Path, serializer: Serializer) -> Tuple[Path, Path]:
+    return data_dir / f"flowers{serializer.suffix}", data_dir / f"invoices{serializer.suffix}"
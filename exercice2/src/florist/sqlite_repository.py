@@ -0,0 +1,411 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from .indexes import query_terms, text_matches
+from .loyalty import LoyaltySummary
+from .models import Facture, Fleur
+from .reports import GROUP_BY, SalesRow
+from .repositories import BulkResult, _check_search_bounds, _parse_date
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flowers (
+    id TEXT PRIMARY KEY,
+    espece TEXT NOT NULL,
+    date_coupe TEXT NOT NULL,
+    qualite TEXT NOT NULL,
+    prix REAL NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_flowers_prix ON flowers (prix);
+CREATE INDEX IF NOT EXISTS idx_flowers_date_coupe ON flowers (date_coupe);
+
+CREATE TABLE IF NOT EXISTS invoices (
+    id TEXT PRIMARY KEY,
+    client TEXT NOT NULL,
+    date_vente TEXT NOT NULL,
+    prix_vente REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_invoices_client ON invoices (client, date_vente);
+CREATE INDEX IF NOT EXISTS idx_invoices_date_vente ON invoices (date_vente);
+
+CREATE TABLE IF NOT EXISTS invoice_flowers (
+    invoice_id TEXT NOT NULL REFERENCES invoices (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    flower_id TEXT NOT NULL REFERENCES flowers (id),
+    PRIMARY KEY (invoice_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_invoice_flowers_flower ON invoice_flowers (flower_id);
+"""
+
+_FLOWER_COLUMNS = "f.id, f.espece, f.date_coupe, f.qualite, f.prix"
+
+_SALES_KEYS = {"day": "i.date_vente", "species": "f.espece", "quality": "f.qualite", "client": "i.client"}
+
+
+def _row_to_fleur(row: Sequence) -> Fleur:
+    return Fleur.from_trusted(
+        id=row[0],
+        espece=row[1],
+        date_coupe=date.fromisoformat(row[2]),
+        qualite=row[3],
+        prix=row[4],
+    )
+
+
+def _sql_limit(limit: Optional[int]) -> int:
+    return -1 if limit is None else int(limit)
+
+
+class SqliteRepository:
+    # Deleted flowers are kept as tombstones (deleted = 1) so that invoices
+    # referencing them through invoice_flowers can still be rebuilt.
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.create_function("text_matches", 2, text_matches, deterministic=True)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+        self._version = 0
+        self._version_stamp: Optional[tuple] = None
+
+    @property
+    def version(self) -> int:
+        # data_version moves on commits from other connections, total_changes on ours
+        with self._lock:
+            stamp = (self._conn.execute("PRAGMA data_version").fetchone()[0], self._conn.total_changes)
+            if stamp != self._version_stamp:
+                self._version_stamp = stamp
+                self._version += 1
+            return self._version
+
+    def preload(self) -> None:
+        # full scans pull the tables into the OS page cache before traffic arrives
+        for table in ("flowers", "invoices", "invoice_flowers"):
+            self._query(f"SELECT COUNT(*), MAX(rowid) FROM {table} NOT INDEXED")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _existing_ids(self, table: str, ids: Iterable[str], where: str = "1") -> Set[str]:
+        ids = list(set(ids))
+        found: Set[str] = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = self._conn.execute(
+                f"SELECT id FROM {table} WHERE {where} AND id IN ({placeholders})", chunk
+            ).fetchall()
+            found.update(r[0] for r in rows)
+        return found
+
+    def _query(self, sql: str, params: Iterable = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, tuple(params)).fetchall()
+
+    # ---------------- Flowers ----------------
+
+    def _flowers_where(self, clause: str, params: Iterable = (), tail: str = "ORDER BY f.rowid") -> List[Fleur]:
+        rows = self._query(
+            f"SELECT {_FLOWER_COLUMNS} FROM flowers f WHERE f.deleted = 0 AND {clause} {tail}",
+            params,
+        )
+        return [_row_to_fleur(r) for r in rows]
+
+    def list_flowers(self) -> List[Fleur]:
+        return self._flowers_where("1")
+
+    def iter_flowers(self, batch_size: int = 1000) -> Iterator[Fleur]:
+        after_id = None
+        while True:
+            page = self.page_flowers(batch_size, after_id)
+            yield from page
+            if len(page) < batch_size:
+                return
+            after_id = page[-1].id
+
+    def page_flowers(self, limit: Optional[int] = None, after_id: Optional[str] = None) -> List[Fleur]:
+        return self._flowers_where("f.id > ?", (after_id or "",), f"ORDER BY f.id LIMIT {_sql_limit(limit)}")
+
+    def get_flower(self, flower_id: str) -> Optional[Fleur]:
+        res = self._flowers_where("f.id = ?", (flower_id,))
+        return res[0] if res else None
+
+    def get_flowers(self, flower_ids: Iterable[str]) -> Dict[str, Fleur]:
+        ids = list(set(flower_ids))
+        found: Dict[str, Fleur] = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            found.update((f.id, f) for f in self._flowers_where(f"f.id IN ({placeholders})", chunk))
+        return found
+
+    def _insert_flowers(self, flowers: Iterable[Fleur], deleted: int = 0) -> None:
+        self._conn.executemany(
+            "INSERT INTO flowers (id, espece, date_coupe, qualite, prix, deleted) VALUES (?, ?, ?, ?, ?, ?)",
+            [(f.id, f.espece, f.date_coupe.isoformat(), f.qualite, f.prix, deleted) for f in flowers],
+        )
+
+    def add_flower(self, flower: Fleur) -> Fleur:
+        with self._lock, self._conn:
+            try:
+                self._insert_flowers([flower])
+            except sqlite3.IntegrityError:
+                raise ValueError("flower id already exists") from None
+        return flower
+
+    def add_flowers(self, flowers: Iterable[Fleur]) -> BulkResult[Fleur]:
+        flowers = list(flowers)
+        result: BulkResult[Fleur] = BulkResult()
+        with self._lock, self._conn:
+            seen = self._existing_ids("flowers", (f.id for f in flowers))
+            for index, flower in enumerate(flowers):
+                if flower.id in seen:
+                    result.errors.append((index, "flower id already exists"))
+                    continue
+                seen.add(flower.id)
+                result.added.append(flower)
+            self._insert_flowers(result.added)
+        return result
+
+    def delete_flower(self, flower_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE flowers SET deleted = 1 WHERE id = ?", (flower_id,))
+
+    def search_flowers_price_between(self, prix_min: float, prix_max: float) -> List[Fleur]:
+        if prix_min > prix_max:
+            raise ValueError("prix_min must be <= prix_max")
+        return self._flowers_where("f.prix BETWEEN ? AND ?", (prix_min, prix_max))
+
+    def search_flowers_by_cut_date(self, cut_date: str | date) -> List[Fleur]:
+        d = _parse_date(cut_date)
+        return self._flowers_where("f.date_coupe = ?", (d.isoformat(),))
+
+    def search_flowers_by_cut_date_between(self, debut: str | date, fin: str | date) -> List[Fleur]:
+        debut, fin = _parse_date(debut), _parse_date(fin)
+        if debut > fin:
+            raise ValueError("debut must be <= fin")
+        return self._flowers_where("f.date_coupe BETWEEN ? AND ?", (debut.isoformat(), fin.isoformat()))
+
+    def search_flowers(
+        self,
+        espece: Optional[str] = None,
+        qualite: Optional[str] = None,
+        prix_min: Optional[float] = None,
+        prix_max: Optional[float] = None,
+        debut: Optional[str | date] = None,
+        fin: Optional[str | date] = None,
+    ) -> List[Fleur]:
+        debut, fin = _check_search_bounds(prix_min, prix_max, debut, fin)
+        for query in (espece, qualite):
+            if query is not None:
+                query_terms(query)
+        clauses, params = ["1"], []
+        # the indexed price / date clauses narrow the rows before text_matches runs
+        for sql, value in (
+            ("text_matches(f.espece, ?)", espece),
+            ("text_matches(f.qualite, ?)", qualite),
+            ("f.prix >= ?", prix_min),
+            ("f.prix <= ?", prix_max),
+            ("f.date_coupe >= ?", debut and debut.isoformat()),
+            ("f.date_coupe <= ?", fin and fin.isoformat()),
+        ):
+            if value is not None:
+                clauses.append(sql)
+                params.append(value)
+        return self._flowers_where(" AND ".join(clauses), params)
+
+    # ---------------- Invoices ----------------
+
+    def _invoices_where(self, clause: str, params: Iterable = (), tail: str = "ORDER BY i.rowid") -> List[Facture]:
+        params = tuple(params)
+        with self._lock:
+            heads = self._conn.execute(
+                f"SELECT i.id, i.client, i.date_vente, i.prix_vente FROM invoices i WHERE {clause} {tail}",
+                params,
+            ).fetchall()
+            lines = self._conn.execute(
+                f"SELECT l.invoice_id, {_FLOWER_COLUMNS} FROM invoice_flowers l"
+                " JOIN flowers f ON f.id = l.flower_id"
+                f" WHERE l.invoice_id IN (SELECT i.id FROM invoices i WHERE {clause} {tail})"
+                " ORDER BY l.invoice_id, l.position",
+                params,
+            ).fetchall()
+
+        flowers: Dict[str, Fleur] = {}
+        bouquets: Dict[str, List[Fleur]] = {}
+        for row in lines:
+            f = flowers.get(row[1])
+            if f is None:
+                f = flowers[row[1]] = _row_to_fleur(row[1:])
+            bouquets.setdefault(row[0], []).append(f)
+
+        return [
+            Facture.from_trusted(
+                id=inv_id,
+                client=client,
+                date_vente=date.fromisoformat(date_vente),
+                bouquet=bouquets.get(inv_id, []),
+                prix_vente=prix_vente,
+            )
+            for inv_id, client, date_vente, prix_vente in heads
+        ]
+
+    def list_invoices(self) -> List[Facture]:
+        return self._invoices_where("1")
+
+    def iter_invoices(self, batch_size: int = 1000) -> Iterator[Facture]:
+        after_id = None
+        while True:
+            page = self.page_invoices(batch_size, after_id)
+            yield from page
+            if len(page) < batch_size:
+                return
+            after_id = page[-1].id
+
+    def page_invoices(
+        self, limit: Optional[int] = None, after_id: Optional[str] = None, client: Optional[str] = None
+    ) -> List[Facture]:
+        clause, params = "i.id > ?", [after_id or ""]
+        if client:
+            clause += " AND i.client = ?"
+            params.append(client)
+        return self._invoices_where(clause, params, f"ORDER BY i.id LIMIT {_sql_limit(limit)}")
+
+    def get_invoice(self, invoice_id: str) -> Optional[Facture]:
+        res = self._invoices_where("i.id = ?", (invoice_id,))
+        return res[0] if res else None
+
+    def _insert_invoices(self, invoices: Iterable[Facture]) -> None:
+        invoices = list(invoices)
+        self._conn.executemany(
+            "INSERT INTO invoices (id, client, date_vente, prix_vente) VALUES (?, ?, ?, ?)",
+            [(inv.id, inv.client, inv.date_vente.isoformat(), inv.prix_vente) for inv in invoices],
+        )
+        self._conn.executemany(
+            "INSERT INTO invoice_flowers (invoice_id, position, flower_id) VALUES (?, ?, ?)",
+            [(inv.id, pos, f.id) for inv in invoices for pos, f in enumerate(inv.bouquet)],
+        )
+
+    def create_invoice(self, client: str, date_vente: date, bouquet_ids: List[str]) -> Facture:
+        with self._lock, self._conn:
+            flowers = self.get_flowers(bouquet_ids)
+            if any(fid not in flowers for fid in bouquet_ids):
+                raise ValueError("unknown flower id in bouquet")
+            invoice = Facture(client=client, date_vente=date_vente, bouquet=[flowers[fid] for fid in bouquet_ids])
+            self._insert_invoices([invoice])
+        return invoice
+
+    def add_invoice(self, invoice: Facture) -> Facture:
+        with self._lock, self._conn:
+            known = self._existing_ids("flowers", (f.id for f in invoice.bouquet), "deleted = 0")
+            if any(f.id not in known for f in invoice.bouquet):
+                raise ValueError("invoice contains unknown flower")
+            try:
+                self._insert_invoices([invoice])
+            except sqlite3.IntegrityError:
+                raise ValueError("invoice id already exists") from None
+        return invoice
+
+    def add_invoices(self, invoices: Iterable[Facture]) -> BulkResult[Facture]:
+        invoices = list(invoices)
+        result: BulkResult[Facture] = BulkResult()
+        with self._lock, self._conn:
+            known_flowers = self._existing_ids(
+                "flowers", (f.id for inv in invoices for f in inv.bouquet), "deleted = 0"
+            )
+            seen = self._existing_ids("invoices", (inv.id for inv in invoices))
+            for index, invoice in enumerate(invoices):
+                if any(f.id not in known_flowers for f in invoice.bouquet):
+                    result.errors.append((index, "invoice contains unknown flower"))
+                    continue
+                if invoice.id in seen:
+                    result.errors.append((index, "invoice id already exists"))
+                    continue
+                seen.add(invoice.id)
+                result.added.append(invoice)
+            self._insert_invoices(result.added)
+        return result
+
+    def delete_invoice(self, invoice_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM invoices WHERE id = ?", (invoice_id,))
+
+    def invoices_by_client(self, client: str) -> List[Facture]:
+        return self._invoices_where("i.client = ?", (client,))
+
+    def invoices_between(
+        self, debut: str | date, fin: str | date, client: Optional[str] = None
+    ) -> List[Facture]:
+        debut, fin = _parse_date(debut), _parse_date(fin)
+        if debut > fin:
+            raise ValueError("debut must be <= fin")
+        clause, params = "i.date_vente BETWEEN ? AND ?", [debut.isoformat(), fin.isoformat()]
+        if client is not None:
+            clause = "i.client = ? AND " + clause
+            params.insert(0, client)
+        return self._invoices_where(clause, params, "ORDER BY i.date_vente, i.rowid")
+
+    def _loyalty_where(self, clause: str, params: Iterable = ()) -> List[LoyaltySummary]:
+        rows = self._query(
+            "SELECT client, SUM(CAST(ROUND(prix_vente * 100) AS INTEGER)), COUNT(*) FROM invoices"
+            f" WHERE {clause} GROUP BY client ORDER BY client",
+            params,
+        )
+        return [LoyaltySummary(client, total, count) for client, total, count in rows]
+
+    def loyalty_summaries(self) -> List[LoyaltySummary]:
+        return self._loyalty_where("1")
+
+    def loyalty_summary(self, client: str) -> Optional[LoyaltySummary]:
+        res = self._loyalty_where("client = ?", (client,))
+        return res[0] if res else None
+
+    def sales_report(
+        self, group_by: str, debut: Optional[str | date] = None, fin: Optional[str | date] = None
+    ) -> List[SalesRow]:
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+        debut, fin = _check_search_bounds(None, None, debut, fin)
+        key = _SALES_KEYS[group_by]
+        rows = self._query(
+            f"SELECT {key}, SUM(CAST(ROUND(f.prix * 100) AS INTEGER)), COUNT(DISTINCT i.id), COUNT(*)"
+            " FROM invoices i JOIN invoice_flowers x ON x.invoice_id = i.id JOIN flowers f ON f.id = x.flower_id"
+            " WHERE i.date_vente >= ? AND i.date_vente <= ?"
+            f" GROUP BY {key} ORDER BY {key}",
+            ((debut or date.min).isoformat(), (fin or date.max).isoformat()),
+        )
+        return [SalesRow(*row) for row in rows]
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return not self._conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM flowers) OR EXISTS (SELECT 1 FROM invoices)"
+            ).fetchone()[0]
+
+    def import_data(self, flowers: List[Fleur], invoices: List[Facture], replace: bool = False) -> None:
+        # replace=True empties the tables first, in the same transaction
+        known = {f.id for f in flowers}
+        retired: Dict[str, Fleur] = {}
+        for inv in invoices:
+            for f in inv.bouquet:
+                if f.id not in known:
+                    retired.setdefault(f.id, f)
+
+        with self._lock, self._conn:
+            if replace:
+                for table in ("invoice_flowers", "invoices", "flowers"):
+                    self._conn.execute(f"DELETE FROM {table}")
+            self._insert_flowers(flowers)
+            self._insert_flowers(retired.values(), deleted=1)
+            self._insert_invoices(invoices)
@@ -0,0 +1,196 @@
+import json
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+from exercice2.src.florist.api import app, configure
+from exercice2.src.florist.config import Settings
+from exercice2.src.florist.metrics import HTTP_REQUESTS
+from exercice2.src.florist.repositories import JournalRepository, JsonRepository
+
+
+@pytest.fixture(params=["cached", "sqlite"])
+def client(request: pytest.FixtureRequest, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[TestClient]:
+    monkeypatch.setenv("FLORIST_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("FLORIST_REPOSITORY", request.param)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def flower(espece: str = "Rose", prix: float = 4.99, cut: str = "2026-01-01", qualite: str = "A") -> dict:
+    return {"espece": espece, "date_coupe": cut, "qualite": qualite, "prix": prix}
+
+
+def test_bulk_endpoints_report_bad_items_by_index(client: TestClient) -> None:
+    res = client.post("/flowers/bulk", json=[flower(), {"espece": "Rose"}, flower(prix=5.0), 7, flower("Tulipe")])
+    assert res.status_code == 200
+    body = res.json()
+    assert [f["espece"] for f in body["created"]] == ["Rose", "Tulipe"]
+    assert [e["index"] for e in body["errors"]] == [1, 2, 3]
+    assert "date_coupe" in body["errors"][0]["detail"]
+
+    rose, tulipe = (f["id"] for f in body["created"])
+    res = client.post(
+        "/invoices/bulk",
+        json=[
+            {"client": "Ana", "date_vente": "2026-01-02", "bouquet_ids": [rose]},
+            {"client": "Ana", "date_vente": "not a date", "bouquet_ids": [rose]},
+            {"client": "Niko", "date_vente": "2026-01-02", "bouquet_ids": ["unknown"]},
+            {"client": "Niko", "date_vente": "2026-01-03", "bouquet_ids": [tulipe]},
+        ],
+    )
+    assert res.status_code == 200
+    body = res.json()
+    assert [inv["client"] for inv in body["created"]] == ["Ana", "Niko"]
+    assert [e["index"] for e in body["errors"]] == [1, 2]
+    assert client.post("/flowers/bulk", json={"espece": "Rose"}).status_code == 422
+
+
+def test_keyset_pagination_header_and_ndjson_export(client: TestClient) -> None:
+    created = client.post("/flowers/bulk", json=[flower(prix=p) for p in (1.99, 2.99, 3.99)]).json()["created"]
+    ids = sorted(f["id"] for f in created)
+    for fid in ids:
+        client.post("/invoices", json={"client": "Ana", "date_vente": "2026-01-02", "bouquet_ids": [fid]})
+    client.post("/invoices", json={"client": "Niko", "date_vente": "2026-01-02", "bouquet_ids": [ids[0]]})
+
+    first = client.get("/flowers", params={"limit": 2})
+    assert [f["id"] for f in first.json()] == ids[:2]
+    assert first.headers["X-Next-After-Id"] == ids[1]
+    last = client.get("/flowers", params={"limit": 2, "after_id": ids[1]})
+    assert [f["id"] for f in last.json()] == ids[2:]
+    assert "X-Next-After-Id" not in last.headers
+    page = client.get("/invoices", params={"limit": 3})
+    assert len(page.json()) == 3 and page.headers["X-Next-After-Id"] == page.json()[-1]["id"]
+
+    res = client.get("/flowers/export")
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    assert sorted(json.loads(line)["id"] for line in res.text.splitlines()) == ids
+    lines = client.get("/invoices/export", params={"client": "Ana"}).text.splitlines()
+    assert len(lines) == 3 and {json.loads(line)["client"] for line in lines} == {"Ana"}
+
+
+def test_loyalty_endpoints_follow_invoices(client: TestClient) -> None:
+    ids = [f["id"] for f in client.post("/flowers/bulk", json=[flower(prix=99.99)] * 3).json()["created"]]
+    invoices = [
+        client.post("/invoices", json={"client": "Ana", "date_vente": "2026-01-02", "bouquet_ids": ids[:2]}).json(),
+        client.post("/invoices", json={"client": "Ana", "date_vente": "2026-01-03", "bouquet_ids": ids[2:]}).json(),
+        client.post("/invoices", json={"client": "Niko", "date_vente": "2026-01-03", "bouquet_ids": ids[2:]}).json(),
+    ]
+
+    ana = client.get("/loyalty/Ana").json()
+    assert (ana["invoice_count"], ana["niveau"]) == (2, "Argent")
+    assert ana["total"] == pytest.approx(invoices[0]["prix_vente"] + invoices[1]["prix_vente"])
+    assert [s["client"] for s in client.get("/loyalty").json()] == ["Ana", "Niko"]
+
+    client.delete(f"/invoices/{invoices[0]['id']}")
+    assert client.get("/loyalty/Ana").json()["niveau"] == "Bronze"
+    client.delete(f"/invoices/{invoices[2]['id']}")
+    assert client.get("/loyalty/Niko").status_code == 404
+
+
+def test_invoices_date_window_query(client: TestClient) -> None:
+    fid = client.post("/flowers", json=flower()).json()["id"]
+    sales = [("Ana", "2026-01-02"), ("Ana", "2026-01-05"), ("Niko", "2026-01-05"), ("Ana", "2026-01-09")]
+    for name, day in sales:
+        client.post("/invoices", json={"client": name, "date_vente": day, "bouquet_ids": [fid]})
+
+    window = client.get("/invoices", params={"from": "2026-01-03", "to": "2026-01-09"}).json()
+    assert sorted(inv["date_vente"] for inv in window) == ["2026-01-05", "2026-01-05", "2026-01-09"]
+    ana = client.get("/invoices", params={"client": "Ana", "from": "2026-01-05"}).json()
+    assert sorted(inv["date_vente"] for inv in ana) == ["2026-01-05", "2026-01-09"]
+    assert client.get("/invoices", params={"from": "2026-01-09", "to": "2026-01-01"}).status_code == 400
+    assert client.get("/invoices", params={"from": "2026-01-01", "limit": 2}).status_code == 400
+
+
+def test_sales_report_groups_and_windows(client: TestClient) -> None:
+    rose, tulipe = (
+        f["id"] for f in client.post("/flowers/bulk", json=[flower(), flower("Tulipe", 2.99)]).json()["created"]
+    )
+    client.post("/invoices", json={"client": "Ana", "date_vente": "2026-01-02", "bouquet_ids": [rose, tulipe]})
+    client.post("/invoices", json={"client": "Niko", "date_vente": "2026-01-05", "bouquet_ids": [rose]})
+
+    by_species = {r["key"]: r for r in client.get("/reports/sales", params={"group_by": "species"}).json()}
+    assert (by_species["Rose"]["stems"], by_species["Rose"]["invoice_count"]) == (2, 2)
+    assert by_species["Tulipe"]["revenue_ht"] == pytest.approx(2.99)
+    days = client.get("/reports/sales", params={"from": "2026-01-03"}).json()
+    assert [(r["key"], r["stems"]) for r in days] == [("2026-01-05", 1)]
+    assert client.get("/reports/sales", params={"group_by": "colour"}).status_code == 400
+
+
+def test_flower_listings_carry_etags_and_answer_304(client: TestClient) -> None:
+    client.post("/flowers", json=flower())
+    first = client.get("/flowers")
+    etag = first.headers["ETag"]
+    again = client.get("/flowers", headers={"If-None-Match": etag})
+    assert (again.status_code, again.headers["ETag"], again.content) == (304, etag, b"")
+    search = client.get("/flowers/search", params={"espece": "tul"})
+    assert search.json() == [] and search.headers["ETag"] != etag
+
+    client.post("/flowers", json=flower("Tulipe"))
+    changed = client.get("/flowers", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert len(changed.json()) == 2
+
+
+def test_metrics_label_requests_by_route_template(client: TestClient) -> None:
+    before = HTTP_REQUESTS.value("DELETE", "/flowers/{flower_id}", 204)
+    for fid in ("a", "b"):
+        client.delete(f"/flowers/{fid}")
+    client.get("/no-such-route")
+
+    assert HTTP_REQUESTS.value("DELETE", "/flowers/{flower_id}", 204) - before == 2
+    res = client.get("/metrics")
+    assert res.headers["content-type"].startswith("text/plain")
+    assert 'route="/flowers/{flower_id}"' in res.text
+    assert 'route="unmatched",status="404"' in res.text
+    assert 'route="/flowers/a"' not in res.text
+
+
+def test_lifespan_builds_the_configured_repository(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("FLORIST_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("FLORIST_REPOSITORY", "journal")
+    with TestClient(app) as test_client:
+        assert isinstance(app.state.repo.sync, JournalRepository)
+        assert app.state.settings.data_dir == tmp_path
+        test_client.post("/flowers", json=flower())
+    assert app.state.repo is None
+    assert (tmp_path / "flowers.json.journal").exists()
+
+
+def test_configure_installs_a_repository_without_lifespan(tmp_path: Path) -> None:
+    repo = JsonRepository(tmp_path / "flowers.json", tmp_path / "invoices.json")
+    configure(app, Settings(data_dir=tmp_path), repo)
+    try:
+        res = TestClient(app).post("/flowers", json=flower())
+        assert [f.id for f in repo.list_flowers()] == [res.json()["id"]]
+    finally:
+        app.state.repo = None
+
+
+def test_combined_flower_search(client: TestClient) -> None:
+    client.post(
+        "/flowers/bulk",
+        json=[
+            flower("Rose ancienne", 4.99, "2026-01-01"),
+            flower("Rose", 9.99, "2026-01-05", "B"),
+            flower("Tulipe", 2.99, "2026-01-05"),
+        ],
+    )
+
+    def search(**params: str) -> list:
+        res = client.get("/flowers/search", params=params)
+        assert res.status_code == 200
+        return sorted(f["espece"] for f in res.json())
+
+    assert search(espece="ros") == ["Rose", "Rose ancienne"]
+    assert search(espece="ANC") == ["Rose ancienne"]
+    assert search(espece="ro", qualite="a") == ["Rose ancienne"]
+    assert search(prix_max="5", **{"from": "2026-01-02"}) == ["Tulipe"]
+    assert client.get("/flowers/search", params={"espece": "--"}).status_code == 400
+    assert client.get("/flowers/search", params={"prix_min": "5", "prix_max": "1"}).status_code == 400
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from exercice2.src.florist.async_repository import AsyncRepository
+from exercice2.src.florist.metrics import STORAGE_WRITES
+from exercice2.src.florist.models import Fleur
+from exercice2.src.florist.repositories import CachedJsonRepository, JsonRepository
+
+
+@pytest.mark.parametrize("cls", [JsonRepository, CachedJsonRepository])
+def test_concurrent_mutations_are_group_committed(tmp_path: Path, cls: type) -> None:
+    repo = AsyncRepository(cls(tmp_path / "flowers.json", tmp_path / "invoices.json"))
+    flowers = [Fleur(espece="Rose", date_coupe=date(2026, 1, 1), qualite="A", prix=4.99) for _ in range(20)]
+
+    async def scenario() -> list:
+        writes = STORAGE_WRITES.value("flowers.json")
+        added = await asyncio.gather(*(repo.add_flower(f) for f in flowers + flowers[:1]), return_exceptions=True)
+        assert STORAGE_WRITES.value("flowers.json") - writes == 1
+        invoices = await asyncio.gather(
+            repo.create_invoice("Ana", date(2026, 1, 2), [flowers[0].id, flowers[1].id]),
+            repo.create_invoice("Ana", date(2026, 1, 2), ["unknown"]),
+            repo.create_invoice("Niko", date(2026, 1, 3), [flowers[2].id]),
+            return_exceptions=True,
+        )
+        await repo.delete_flower(flowers[3].id)
+        listed = await repo.read(repo.sync.list_flowers)
+        await repo.aclose()
+        return [added, invoices, listed]
+
+    added, invoices, listed = asyncio.run(scenario())
+    assert added[:20] == flowers
+    assert isinstance(added[20], ValueError)
+    assert isinstance(invoices[1], ValueError)
+    assert [inv.client for inv in repo.sync.list_invoices()] == ["Ana", "Niko"]
+    assert invoices[0].prix_vente == repo.sync.get_invoice(invoices[0].id).prix_vente
+    assert len(listed) == 19
+
+
+def test_cached_reads_leave_the_loop_while_the_repository_is_busy(tmp_path: Path) -> None:
+    repo = AsyncRepository(CachedJsonRepository(tmp_path / "flowers.json", tmp_path / "invoices.json"))
+    repo.sync.add_flower(Fleur(espece="Rose", date_coupe=date(2026, 1, 1), qualite="A", prix=4.99))
+    repo.sync.preload()
+
+    def where() -> tuple:
+        return threading.get_ident(), len(repo.sync.list_flowers())
+
+    async def scenario() -> list:
+        seen = [await repo.read(where)]
+        held, release = threading.Event(), threading.Event()
+
+        def commit() -> None:
+            with repo.sync._lock:
+                held.set()
+                release.wait()
+
+        writer = threading.Thread(target=commit)
+        writer.start()
+        held.wait()
+        pending = asyncio.ensure_future(repo.read(where))
+        await asyncio.sleep(0.05)
+        assert not pending.done()  # waiting on a worker thread, not on the loop
+        release.set()
+        seen.append(await pending)
+        writer.join()
+
+        JsonRepository(repo.sync.flowers_path, repo.sync.invoices_path).add_flower(
+            Fleur(espece="Tulipe", date_coupe=date(2026, 1, 1), qualite="A", prix=2.99)
+        )
+        seen.append(await repo.read(where))  # reload happens off the loop
+        await repo.aclose()
+        return [threading.get_ident(), seen]
+
+    loop_thread, seen = asyncio.run(scenario())
+    assert seen[0] == (loop_thread, 1)
+    assert seen[1][0] != loop_thread and seen[2][0] != loop_thread
+    assert seen[2][1] == 2
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+from exercice2.benchmarks.bench import run
+from exercice2.benchmarks.compare import compare
+from exercice2.benchmarks.generators import generate_dataset
+
+
+def test_generators_are_deterministic() -> None:
+    flowers, invoices = generate_dataset(50, 30, seed=7)
+    again_flowers, again_invoices = generate_dataset(50, 30, seed=7)
+    assert flowers == again_flowers
+    assert [(i.id, i.client, i.bouquet) for i in invoices] == [(i.id, i.client, i.bouquet) for i in again_invoices]
+    assert all(i.date_vente >= f.date_coupe for i in invoices for f in i.bouquet)
+
+
+def test_small_run_reports_every_repository_benchmark(tmp_path: Path) -> None:
+    report = run(tmp_path, 40, 40, repository="cached", repeat=1, api=False)
+    names = {r["name"] for r in report["results"]}
+    assert {"list_flowers", "add_flower", "delete_flower", "cards_for_all_clients"} <= names
+    assert all(r["median"] >= 0 for r in report["results"])
+    assert all(verdict == "" for *_, verdict in compare(report, report))
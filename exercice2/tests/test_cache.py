@@ -0,0 +1,24 @@
+from exercice2.src.florist.cache import CachedResponse, ResponseCache, etag_matches, make_etag
+
+
+def test_response_cache_evicts_lru_and_drops_entries_on_new_version() -> None:
+    cache = ResponseCache(maxsize=2)
+    for key in ("a", "b"):
+        cache.put(key, 1, CachedResponse(key.encode(), make_etag(key.encode())))
+    cache.get("a", 1)
+    cache.put("c", 1, CachedResponse(b"c", make_etag(b"c")))
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1).body == b"a"
+
+    assert cache.get("a", 2) is None
+    assert len(cache) == 0
+    cache.put("a", 1, CachedResponse(b"stale", make_etag(b"stale")))
+    assert cache.get("a", 2) is None
+
+
+def test_etag_matches_lists_weak_tags_and_wildcard() -> None:
+    etag = make_etag(b"body")
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
@@ -0,0 +1,41 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from exercice2.src.florist import convert, migrate
+from exercice2.src.florist.config import DEFAULT_DATA_DIR, Settings, build_repository
+from exercice2.src.florist.models import Fleur
+from exercice2.src.florist.repositories import CachedJsonRepository
+from exercice2.src.florist.sqlite_repository import SqliteRepository
+
+
+def test_settings_from_env_defaults_to_module_data_dir() -> None:
+    settings = Settings.from_env({})
+    assert settings.data_dir == DEFAULT_DATA_DIR
+    assert DEFAULT_DATA_DIR.parent.name == "exercice2"
+    assert (settings.repository, settings.preload) == ("json", False)
+
+    with pytest.raises(ValueError):
+        Settings.from_env({"FLORIST_REPOSITORY": "mongo"})
+
+
+def test_build_repository_selects_backend_and_preloads(tmp_path: Path) -> None:
+    env = {"FLORIST_DATA_DIR": str(tmp_path), "FLORIST_REPOSITORY": "cached", "FLORIST_PRELOAD": "true"}
+    repo = build_repository(Settings.from_env(env))
+    assert isinstance(repo, CachedJsonRepository)
+    assert repo._flowers_stamp is not None and repo._invoices_stamp is not None
+
+    sqlite = build_repository(Settings(data_dir=tmp_path, repository="sqlite", preload=True))
+    assert isinstance(sqlite, SqliteRepository) and (tmp_path / "florist.db").exists()
+    sqlite.close()
+
+
+def test_command_line_tools_default_to_the_api_data_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("FLORIST_DATA_DIR", str(tmp_path))
+    repo = build_repository(Settings.from_env())
+    repo.add_flower(Fleur(espece="Rose", date_coupe=date(2026, 1, 1), qualite="A", prix=4.99))
+    migrate.main([])
+    convert.main(["--to", "snapshot"])
+    assert (tmp_path / "florist.db").exists()
+    assert sorted(p.name for p in tmp_path.glob("*.snap")) == ["flowers.snap", "invoices.snap"]
@@ -70,3 +70,34 @@ def test_factures_entre_invalid_range_raises() -> None:
     card = CarteDeFidelite(client="Niko")
     with pytest.raises(ValueError):
         card.factures_entre(date(2026, 2, 1), date(2026, 1, 1))
+
+
+def test_total_is_kept_incrementally() -> None:
+    history = [make_invoice(client="Niko", sale=date(2026, 1, 2 + i)) for i in range(3)]
+    card = CarteDeFidelite(client="Niko", factures=history)
+    assert card.total == pytest.approx(3 * 119.99)
+    assert card.niveau == "Argent"
+
+    card.ajouter_facture(make_invoice(client="Niko", sale=date(2026, 1, 10)))
+    assert card.total == pytest.approx(4 * 119.99)
+    card.reset_historique()
+    assert card.total == 0
+
+
+def test_factures_entre_returns_sale_date_order() -> None:
+    late = make_invoice(client="Niko", sale=date(2026, 1, 20))
+    early = make_invoice(client="Niko", sale=date(2026, 1, 5))
+    card = CarteDeFidelite(client="Niko", factures=[late])
+    card.ajouter_facture(early)
+
+    assert [f.id for f in card.factures_entre(date(2026, 1, 1), date(2026, 1, 31))] == [early.id, late.id]
+    assert card.factures_entre(date(2026, 1, 6), date(2026, 1, 19)) == []
+
+
+def test_cards_compare_on_history_not_on_cached_totals() -> None:
+    inv = make_invoice(client="Niko", sale=date(2026, 1, 2))
+    built = CarteDeFidelite(client="Niko", factures=[inv])
+    added = CarteDeFidelite(client="Niko")
+    added.ajouter_facture(inv)
+    assert built == added
+    assert "_jours" not in repr(built)
@@ -0,0 +1,49 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from exercice2.src.florist.metrics import STORAGE_READS, STORAGE_WRITE_BYTES, Counter, Histogram, Registry, _Metric
+from exercice2.src.florist.models import Fleur
+from exercice2.src.florist.repositories import JsonRepository
+
+
+def test_registry_renders_prometheus_text() -> None:
+    registry = Registry()
+    hits = Counter("hits_total", "Hits.", ("route",), registry=registry)
+    latency = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0), registry=registry)
+    hits.labels("/a").inc()
+    hits.labels(route='/"b"').inc(2)
+    latency.labels("/a").observe(0.05)
+    latency.labels("/a").observe(5)
+
+    text = registry.render()
+    assert "# TYPE hits_total counter" in text
+    assert 'hits_total{route="/a"} 1' in text
+    assert 'hits_total{route="/\\"b\\""} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{route="/a"} 2' in text
+
+
+def test_repository_counts_file_reads_and_written_bytes(tmp_path: Path) -> None:
+    repo = JsonRepository(tmp_path / "flowers.json", tmp_path / "invoices.json")
+    reads = STORAGE_READS.value("flowers.json")
+    written = STORAGE_WRITE_BYTES.value("flowers.json")
+
+    repo.add_flower(Fleur(espece="Rose", date_coupe=date(2026, 1, 1), qualite="A", prix=4.99))
+    repo.list_flowers()
+
+    assert STORAGE_READS.value("flowers.json") == reads + 1
+    assert STORAGE_WRITE_BYTES.value("flowers.json") == written + repo.flowers_path.stat().st_size
+
+
+def test_incomplete_metric_type_fails_at_construction() -> None:
+    class Gauge(_Metric):
+        kind = "gauge"
+
+        def _new_child(self) -> object:
+            return object()
+
+    with pytest.raises(TypeError):
+        Gauge("level", "Level.", registry=Registry())
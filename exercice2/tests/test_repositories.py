@@ -0,0 +1,383 @@
+import json
+import threading
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from exercice2.src.florist.convert import convert_file
+from exercice2.src.florist import migrate, repositories
+from exercice2.src.florist.migrate import migrate_json_to_sqlite
+from exercice2.src.florist.models import Facture, Fleur, fleur_to_dict
+from exercice2.src.florist.repositories import CachedJsonRepository, JournalRepository, JsonRepository
+from exercice2.src.florist.serializers import SERIALIZERS, SNAPSHOT_MAGIC, data_paths, load_records
+from exercice2.src.florist.sqlite_repository import SqliteRepository
+
+
+def make_repo(tmp_path: Path) -> CachedJsonRepository:
+    return CachedJsonRepository(tmp_path / "flowers.json", tmp_path / "invoices.json")
+
+
+def make_flower(price: float = 4.99, cut: date = date(2026, 1, 1)) -> Fleur:
+    return Fleur(espece="Rose", date_coupe=cut, qualite="A", prix=price)
+
+
+def test_cached_repository_writes_through(tmp_path: Path) -> None:
+    repo = make_repo(tmp_path)
+    f = repo.add_flower(make_flower())
+    inv = repo.add_invoice(Facture(client="Niko", date_vente=date(2026, 1, 2), bouquet=[f]))
+
+    plain = JsonRepository(repo.flowers_path, repo.invoices_path)
+    assert [x.id for x in plain.list_flowers()] == [f.id]
+    assert [x.id for x in plain.list_invoices()] == [inv.id]
+    assert repo.get_flower(f.id) is f
+
+
+def test_cached_repository_reloads_after_external_change(tmp_path: Path) -> None:
+    repo = make_repo(tmp_path)
+    f = repo.add_flower(make_flower())
+
+    plain = JsonRepository(repo.flowers_path, repo.invoices_path)
+    other = plain.add_flower(make_flower(price=9.99))
+
+    assert {x.id for x in repo.list_flowers()} == {f.id, other.id}
+
+
+def test_journal_repository_replays_and_compacts(tmp_path: Path) -> None:
+    repo = JournalRepository(tmp_path / "flowers.json", tmp_path / "invoices.json", compact_after=3)
+    a = repo.add_flower(make_flower())
+    b = repo.add_flower(make_flower(price=9.99))
+    repo.delete_flower(a.id)
+    assert repo.flowers_journal.exists() is False
+
+    c = repo.add_flower(make_flower(price=1.99))
+    assert repo.flowers_journal.exists()
+
+    reopened = JournalRepository(repo.flowers_path, repo.invoices_path)
+    assert {x.id for x in reopened.list_flowers()} == {b.id, c.id}
+    plain = JsonRepository(repo.flowers_path, repo.invoices_path)
+    assert [x.id for x in plain.list_flowers()] == [b.id]
+
+
+def test_migrate_json_to_sqlite_keeps_sold_flowers(tmp_path: Path) -> None:
+    source = JsonRepository(tmp_path / "flowers.json", tmp_path / "invoices.json")
+    kept = source.add_flower(make_flower(price=9.99, cut=date(2026, 1, 5)))
+    sold = source.add_flower(make_flower())
+    inv = source.add_invoice(Facture(client="Niko", date_vente=date(2026, 1, 6), bouquet=[sold, kept]))
+    source.delete_flower(sold.id)
+
+    assert migrate_json_to_sqlite(source.flowers_path, source.invoices_path, tmp_path / "florist.db") == (1, 1)
+
+    repo = SqliteRepository(tmp_path / "florist.db")
+    try:
+        assert [f.id for f in repo.list_flowers()] == [kept.id]
+        assert [f.id for f in repo.search_flowers_price_between(9, 10)] == [kept.id]
+        assert [f.id for f in repo.search_flowers_by_cut_date("2026-01-05")] == [kept.id]
+        [loaded] = repo.invoices_by_client("Niko")
+        assert [f.id for f in loaded.bouquet] == [sold.id, kept.id]
+        assert loaded.prix_vente == inv.prix_vente
+    finally:
+        repo.close()
+
+
+def test_cached_repository_range_indexes_follow_add_and_delete(tmp_path: Path) -> None:
+    repo = make_repo(tmp_path)
+    cheap = repo.add_flower(make_flower(price=1.99, cut=date(2026, 1, 1)))
+    mid = repo.add_flower(make_flower(price=4.99, cut=date(2026, 1, 3)))
+    dear = repo.add_flower(make_flower(price=9.99, cut=date(2026, 1, 5)))
+
+    assert [f.id for f in repo.search_flowers_price_between(1.99, 4.99)] == [cheap.id, mid.id]
+    assert [f.id for f in repo.search_flowers_by_cut_date(date(2026, 1, 5))] == [dear.id]
+    assert [f.id for f in repo.search_flowers_by_cut_date_between("2026-01-02", "2026-01-05")] == [mid.id, dear.id]
+
+    repo.delete_flower(mid.id)
+    assert [f.id for f in repo.search_flowers_price_between(0, 100)] == [cheap.id, dear.id]
+
+
+def test_add_flowers_reports_duplicates_and_writes_once(tmp_path: Path) -> None:
+    repo = JsonRepository(tmp_path / "flowers.json", tmp_path / "invoices.json")
+    existing = repo.add_flower(make_flower())
+    fresh = make_flower(price=9.99)
+
+    res = repo.add_flowers([fresh, existing, fresh])
+
+    assert [f.id for f in res.added] == [fresh.id]
+    assert res.errors == [(1, "flower id already exists"), (2, "flower id already exists")]
+    assert {f.id for f in repo.list_flowers()} == {existing.id, fresh.id}
+
+
+def test_page_flowers_uses_id_cursor(tmp_path: Path) -> None:
+    repo = make_repo(tmp_path)
+    ids = sorted(repo.add_flower(make_flower()).id for _ in range(5))
+
+    first = repo.page_flowers(limit=2)
+    rest = repo.page_flowers(after_id=first[-1].id)
+
+    assert [f.id for f in first + rest] == ids
+    assert sorted(f.id for f in repo.iter_flowers()) == ids
+
+
+def test_concurrent_writers_do_not_lose_updates(tmp_path: Path) -> None:
+    repos = [make_repo(tmp_path) for _ in range(4)]
+
+    def add_many(repo: CachedJsonRepository) -> None:
+        for _ in range(10):
+            repo.add_flower(make_flower())
+
+    threads = [threading.Thread(target=add_many, args=(r,)) for r in repos]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(JsonRepository(tmp_path / "flowers.json", tmp_path / "invoices.json").list_flowers()) == 40
+
+
+def test_create_invoice_resolves_bouquet_in_one_lookup(tmp_path: Path) -> None:
+    repo = JsonRepository(tmp_path / "flowers.json", tmp_path / "invoices.json")
+    a = repo.add_flower(make_flower())
+    b = repo.add_flower(make_flower(price=9.99))
+
+    assert set(repo.get_flowers([a.id, b.id, "missing"])) == {a.id, b.id}
+    inv = repo.create_invoice("Niko", date(2026, 1, 2), [b.id, a.id, b.id])
+    assert [f.id for f in repo.get_invoice(inv.id).bouquet] == [b.id, a.id, b.id]
+    with pytest.raises(ValueError):
+        repo.create_invoice("Niko", date(2026, 1, 2), [a.id, "missing"])
+
+
+def test_invoices_reference_catalogue_flowers_and_survive_deletion(tmp_path: Path) -> None:
+    repo = make_repo(tmp_path)
+    f = repo.add_flower(make_flower())
+    inv = repo.create_invoice("Niko", date(2026, 1, 2), [f.id, f.id])
+
+    stored = json.loads(repo.invoices_path.read_text(encoding="utf-8"))
+    assert stored[0]["bouquet"] == [{"id": f.id, "prix": 4.99}, {"id": f.id, "prix": 4.99}]
+
+    [loaded] = JsonRepository(repo.flowers_path, repo.invoices_path).list_invoices()
+    assert loaded.bouquet[0] is loaded.bouquet[1]
+
+    repo.delete_flower(f.id)
+    [loaded] = JsonRepository(repo.flowers_path, repo.invoices_path).list_invoices()
+    assert loaded.bouquet[0] == f
+    assert loaded.prix_vente == inv.prix_vente
+
+
+def test_loyalty_view_follows_add_and_delete_invoice(tmp_path: Path) -> None:
+    repo = make_repo(tmp_path)
+    f = repo.add_flower(make_flower(price=99.99))
+    first = repo.create_invoice("Niko", date(2026, 1, 2), [f.id])
+    repo.create_invoice("Niko", date(2026, 1, 3), [f.id, f.id])
+    repo.create_invoice("Ana", date(2026, 1, 3), [f.id])
+
+    niko = repo.loyalty_summary("Niko")
+    assert (niko.invoice_count, niko.total, niko.niveau) == (2, 359.97, "Argent")
+    assert [s.client for s in repo.loyalty_summaries()] == ["Ana", "Niko"]
+
+    repo.delete_invoice(first.id)
+    assert repo.loyalty_summary("Niko").invoice_count == 1
+    assert JsonRepository(repo.flowers_path, repo.invoices_path).loyalty_summary("Niko").total == 239.98
+    assert repo.loyalty_summary("Nobody") is None
+
+
+def test_invoices_between_uses_per_client_date_index(tmp_path: Path) -> None:
+    repo = make_repo(tmp_path)
+    f = repo.add_flower(make_flower())
+    late = repo.create_invoice("Niko", date(2026, 3, 1), [f.id])
+    early = repo.create_invoice("Niko", date(2026, 1, 10), [f.id])
+    other = repo.create_invoice("Ana", date(2026, 1, 15), [f.id])
+
+    assert repo.invoices_between(date(2026, 1, 1), date(2026, 3, 1), "Niko") == [early, late]
+    assert repo.invoices_between("2026-01-01", "2026-01-31") == [early, other]
+
+    repo.delete_invoice(early.id)
+    assert repo.invoices_between(date(2026, 1, 1), date(2026, 1, 31), "Niko") == []
+
+
+@pytest.mark.parametrize("backend", ["json", "cached", "sqlite"])
+def test_sales_report_groups_and_filters_by_sale_date(tmp_path: Path, backend: str) -> None:
+    if backend == "sqlite":
+        repo = SqliteRepository(tmp_path / "florist.db")
+    else:
+        repo = {"json": JsonRepository, "cached": CachedJsonRepository}[backend](
+            tmp_path / "flowers.json", tmp_path / "invoices.json"
+        )
+    rose = repo.add_flower(make_flower(price=2.99))
+    tulip = repo.add_flower(Fleur(espece="Tulipe", date_coupe=date(2026, 1, 1), qualite="B", prix=1.99))
+    repo.create_invoice("Niko", date(2026, 1, 2), [rose.id, rose.id, tulip.id])
+    dropped = repo.create_invoice("Ana", date(2026, 1, 2), [tulip.id])
+    repo.create_invoice("Ana", date(2026, 1, 5), [rose.id])
+    repo.delete_invoice(dropped.id)
+
+    species = repo.sales_report("species")
+    assert [(r.key, r.revenue_ht_centimes, r.invoice_count, r.stems) for r in species] == [
+        ("Rose", 897, 2, 3),
+        ("Tulipe", 199, 1, 1),
+    ]
+    days = repo.sales_report("day", "2026-01-01", date(2026, 1, 3))
+    assert [(r.key, r.revenue_ht, r.revenue) for r in days] == [("2026-01-02", 7.97, 9.56)]
+    with pytest.raises(ValueError):
+        repo.sales_report("month")
+
+
+@pytest.mark.parametrize("backend", ["json", "cached", "sqlite"])
+def test_search_flowers_matches_word_prefixes_case_insensitively(tmp_path: Path, backend: str) -> None:
+    if backend == "sqlite":
+        repo = SqliteRepository(tmp_path / "florist.db")
+    else:
+        repo = {"json": JsonRepository, "cached": CachedJsonRepository}[backend](
+            tmp_path / "flowers.json", tmp_path / "invoices.json"
+        )
+    old_rose = repo.add_flower(Fleur(espece="Rose ancienne", date_coupe=date(2026, 1, 1), qualite="Extra", prix=6.99))
+    rose = repo.add_flower(make_flower(price=2.99, cut=date(2026, 1, 3)))
+    tulip = repo.add_flower(Fleur(espece="Tulipe", date_coupe=date(2026, 1, 1), qualite="A", prix=1.99))
+    for _ in range(5):
+        repo.add_flower(Fleur(espece="Lys", date_coupe=date(2025, 12, 1), qualite="B", prix=9.99))
+
+    def ids(**filters) -> list:
+        return sorted(f.id for f in repo.search_flowers(**filters))
+
+    assert ids(espece="ROS") == sorted([old_rose.id, rose.id])
+    assert ids(espece="anc") == ids(espece="rose anc") == [old_rose.id]
+    assert ids(espece="ros", qualite="a") == [rose.id]
+    assert ids(qualite="a", prix_max=2) == [tulip.id]
+    assert ids(espece="ro", fin="2026-01-02") == [old_rose.id]
+    assert ids(espece="orchid") == []
+
+    repo.delete_flower(old_rose.id)
+    repo.add_flower(Fleur(espece="Rosier", date_coupe=date(2026, 1, 4), qualite="Extra", prix=12.99))
+    assert [f.espece for f in repo.search_flowers(qualite="extra")] == ["Rosier"]
+    with pytest.raises(ValueError):
+        repo.search_flowers(espece=" - ")
+
+
+def test_version_moves_on_every_write_and_external_change(tmp_path: Path) -> None:
+    repo = make_repo(tmp_path)
+    sqlite = SqliteRepository(tmp_path / "florist.db")
+    for r in (repo, sqlite):
+        v0 = r.version
+        assert r.version == v0
+        f = r.add_flower(make_flower())
+        v1 = r.version
+        assert v1 > v0
+        r.create_invoice("Niko", date(2026, 1, 2), [f.id])
+        assert r.version > v1
+
+    v = repo.version
+    JsonRepository(repo.flowers_path, repo.invoices_path).add_flower(make_flower(price=9.99))
+    assert repo.version > v
+
+
+@pytest.mark.parametrize("repo_class", [JsonRepository, CachedJsonRepository, JournalRepository])
+def test_version_moves_on_own_writes_even_if_file_stamps_do_not(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, repo_class: type
+) -> None:
+    monkeypatch.setattr(repositories, "_file_stamp", lambda path: (1, 1, 1))
+    repo = repo_class(tmp_path / "flowers.json", tmp_path / "invoices.json")
+    v0 = repo.version
+    f = repo.add_flower(make_flower())
+    v1 = repo.version
+    assert v1 > v0
+    repo.create_invoice("Niko", date(2026, 1, 2), [f.id])
+    v2 = repo.version
+    assert v2 > v1
+    assert repo.version == v2
+
+
+@pytest.mark.parametrize("fmt", ["json", "compact", "snapshot"])
+def test_serializers_round_trip_and_convert(tmp_path: Path, fmt: str) -> None:
+    serializer = SERIALIZERS[fmt]
+    repo = CachedJsonRepository(*data_paths(tmp_path, serializer), serializer=serializer)
+    rose, tulip = repo.add_flowers([make_flower(), make_flower(price=2.99)]).added
+    inv = repo.create_invoice("Niko", date(2026, 1, 2), [rose.id, tulip.id])
+    repo.delete_flower(tulip.id)
+
+    fresh = JsonRepository(*data_paths(tmp_path, serializer), serializer=serializer)
+    assert fresh.list_flowers() == [rose]
+    assert fresh.get_invoice(inv.id).bouquet == [rose, tulip]
+
+    target = SERIALIZERS["compact" if fmt == "snapshot" else "snapshot"]
+    for src, dst in zip(data_paths(tmp_path, serializer), data_paths(tmp_path / "out", target)):
+        dst.parent.mkdir(exist_ok=True)
+        convert_file(src, dst, target)
+    converted = JsonRepository(*data_paths(tmp_path / "out", target), serializer=target)
+    assert converted.list_invoices() == fresh.list_invoices()
+
+
+def test_cached_repository_serves_readers_while_one_thread_writes(tmp_path: Path) -> None:
+    repo = make_repo(tmp_path)
+    failures: list = []
+    done = threading.Event()
+
+    def write() -> None:
+        try:
+            for i in range(60):
+                f = repo.add_flower(make_flower(price=i % 7 + 1.99))
+                if i % 2:
+                    repo.delete_flower(f.id)
+        except Exception as e:  # pragma: no cover - reported below
+            failures.append(e)
+        finally:
+            done.set()
+
+    def read() -> None:
+        try:
+            while not done.is_set():
+                repo.search_flowers("ro", prix_min=2.5)
+                repo.page_flowers(5)
+                repo.search_flowers_price_between(1, 5)
+        except Exception as e:  # pragma: no cover - reported below
+            failures.append(e)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert failures == []
+    assert len(repo.list_flowers()) == 30
+
+
+def test_cached_export_iterates_page_by_page_in_id_order(tmp_path: Path) -> None:
+    repo = make_repo(tmp_path)
+    flowers = [repo.add_flower(make_flower()) for _ in range(5)]
+    invoices = [repo.create_invoice("Ana", date(2026, 1, 2), [f.id]) for f in flowers]
+
+    assert [f.id for f in repo.iter_flowers(batch_size=2)] == sorted(f.id for f in flowers)
+    assert [inv.id for inv in repo.iter_invoices(batch_size=5)] == sorted(inv.id for inv in invoices)
+
+
+def test_migrate_refuses_a_filled_database_unless_forced(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    source = JsonRepository(tmp_path / "flowers.snap", tmp_path / "invoices.snap", SERIALIZERS["snapshot"])
+    first = source.add_flower(make_flower())
+    args = ["--data-dir", str(tmp_path)]
+
+    migrate.main(args)  # finds the .snap files although the default format is json
+    source.add_flower(make_flower(price=9.99))
+    with pytest.raises(SystemExit, match="--force"):
+        migrate.main(args)
+    migrate.main(args + ["--force"])
+    assert "imported 2 flowers" in capsys.readouterr().out
+
+    repo = SqliteRepository(tmp_path / "florist.db")
+    try:
+        assert len(repo.list_flowers()) == 2 and repo.get_flower(first.id) is not None
+    finally:
+        repo.close()
+    with pytest.raises(SystemExit, match="no flowers/invoices data files"):
+        migrate.main(["--data-dir", str(tmp_path / "empty")])
+
+
+def test_snapshot_from_another_interpreter_asks_for_a_re_export(tmp_path: Path) -> None:
+    path = tmp_path / "flowers.snap"
+    SERIALIZERS["snapshot"].dump(path, [fleur_to_dict(make_flower())])
+    data = path.read_bytes()
+    assert len(load_records(path)) == 1
+
+    body = data[len(SNAPSHOT_MAGIC) + 1 + data[len(SNAPSHOT_MAGIC)] :]
+    path.write_bytes(SNAPSHOT_MAGIC + bytes([len(b"cpython-3.99-marshal9")]) + b"cpython-3.99-marshal9" + body)
+    with pytest.raises(ValueError, match="written by cpython-3.99-marshal9.*re-export"):
+        load_records(path)
+    path.write_bytes(data[:-3])
+    with pytest.raises(ValueError, match="not a readable snapshot"):
+        load_records(path)